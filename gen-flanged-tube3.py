@@ -11,11 +11,27 @@ make tighter fits.  If the fit is too tight, the outer ring won't fit
 over the inner.  On my Omni (a Prusa-style 3D printer) using CraftWare
 slicing with 0.03 mm layers, thredSlop of 0.03" (and other values
 defaulted) is too small for the ring to fit on, while 0.05" slop works
-ok with 0.02 mm layers.
+ok with 0.02 mm layers.  Rather than rerunning with edited
+constants, use --sweep args to make a plate of test coupons.
 '''
 # Optional params for __main__:
-#    makeConn, makeRing, holeDiam, scaleFactor
-#    These default to 1, 1, 1.33, 25.4 respectively.
+#    makeConn, makeRing, holeDiam, scaleFactor, splitParts
+#    These default to 1, 0, 1.33, 25.4, 0 respectively.  They can be
+#    given in that order, or as name=value forms (eg splitParts=1), or
+#    as GEN_FLANGED_TUBE3_<name> environment variables (see runConfig.py).
+#    If splitParts is non-zero, connector and ring go into separate
+#    include files, rewritten only when changed (see scadParts.py).
+#    If splitBodies=1 (name=value form only), each part instead goes
+#    into its own self-contained file for slicing and printing by
+#    itself: flanged-tube3-connector.scad and flanged-tube3-ring.scad,
+#    or with --sweep, flanged-tube3-sweep-v0.scad etc.  The parts are
+#    built once (see writeBodies in scadParts.py).
+#    A --profile or --profile=X.json arg (anywhere) prints stage times,
+#    counts, and peak memory, and for X.json writes them to X.json.
+#    One or more --sweep=name:v1,v2,... args (name one of thredSlop,
+#    pitch, starts, thredThik) make flanged-tube3-sweep.scad instead:
+#    a grid of short threaded-tube and ring coupons, one pair per
+#    combination of swept values, in the order listed on the console.
 
 # When modifying this code:
 # (a) At outset (ie once only), at command prompt say:
@@ -32,9 +48,8 @@ ok with 0.02 mm layers.
 # (c) In openscad, press F6 to render details, then Export, as STL.
 # (d) Say `craftware $STF &` then slice it and save gcode
 
-from solid import cylinder, hole, part, rotate, scad_render_to_file, scale
-from solid.screw_thread import thread, default_thread_section
-from solid.utils import down, up, left
+# SolidPython is imported where first used, not here.  Say
+# --startup-profile to see a breakdown of import times.
 
 def cylinderAsm(dii, doo, hss):
     '''Produce an assembly of specified cylinders, given three lists that
@@ -45,12 +60,14 @@ def cylinderAsm(dii, doo, hss):
        sequence isn't more than the current height, there is no output
        for that pair of triples.
     '''
+    from solid import cylinder, hole, part
+    from solid.utils import down, up
     # Get inner and outer start and end diameters, and s & e heights
     asm = None
     for jointNum, dis, die, dos, doe, hs, he in zip(range(len(dii)), dii, dii[1:], doo, doo[1:], hss, hss[1:]):
         if hs >= he: # Skip rings that don't have positive thickness
             continue
-        print '{:2}.  dis {:<5.2f}, die {:<5.2f}, dos {:<5.2f}, doe {:<5.2f}, ys {:<5.2f}, ye {:<5.2f}'.format(jointNum, dis, die, dos, doe, hs, he)
+        print ('{:2}.  dis {:<5.2f}, die {:<5.2f}, dos {:<5.2f}, doe {:<5.2f}, ys {:<5.2f}, ye {:<5.2f}'.format(jointNum, dis, die, dos, doe, hs, he))
         co = cylinder(d1=dos, d2=doe, h=he-hs)
         ci = cylinder(d1=dis, d2=die, h=he-hs+0.002)
         cyl = part()(co - hole()(down(0.001)(ci)))
@@ -69,6 +86,9 @@ def threadAsm(uplift, thredID, thredThik, pitch, starts, turns, extern):
        small gaps between thread and cylinder, which if they happen
        will lead to rendering/slicing error messages.
     '''
+    from solid import rotate
+    from solid.screw_thread import thread, default_thread_section
+    from solid.utils import up
     inRadi, eps, thredSpan = thredID/2, 1e-4, pitch*turns
     # Set tooth_height and tooth_depth in thread-shape
     thredShape = default_thread_section((pitch/starts)-eps, thredThik)
@@ -82,56 +102,171 @@ def threadAsm(uplift, thredID, thredThik, pitch, starts, turns, extern):
         thred += rotate(a=(0, 0, (t*360)/starts))(thred1)
     # Return thread moved up to proper position
     return up(uplift)(thred)
-    
+
+threadDefs = {}     # threadAsm args: (module name, thread), of threads made
+
+def cachedThread(*args):
+    '''Return a call of an OpenSCAD module for threadAsm(*args), making
+       the thread only the first time those args are seen.  Use
+       threadModules() to get the module definitions.'''
+    from solid.solidpython import OpenSCADObject
+    if args not in threadDefs:
+        threadDefs[args] = ('thread{}'.format(len(threadDefs)), threadAsm(*args))
+    return OpenSCADObject(threadDefs[args][0], {})
+
+def threadModules():
+    '''Return SCAD text defining a module for each cached thread'''
+    from scadParts import scadModules
+    return scadModules(threadDefs.values())
+
+sweepNames = ('thredSlop', 'pitch', 'starts', 'thredThik')
+
+def sweepFlags(argv):
+    '''Find and remove --sweep=name:v1,v2,... entries in list argv.
+       Return a dict of name: list of values, empty if none found.'''
+    from sys import exit
+    sweep = {}
+    for a in argv[1:]:
+        if a.startswith('--sweep='):
+            name, _, vals = a[8:].partition(':')
+            if name not in sweepNames:
+                exit('Unknown sweep param {}; names are {}'.format(name, ' '.join(sweepNames)))
+            sweep[name] = [(int if name == 'starts' else float)(v) for v in vals.split(',')]
+    argv[1:] = [a for a in argv[1:] if not a.startswith('--sweep=')]
+    return sweep
+
+def couponAsm(thredOD, baseThik, thredSlop, pitch, starts, thredThik):
+    '''Return a short flanged tube with external thread, and a thread
+       ring to fit it, as test coupons for one set of thread params.
+       The ring is as in the full design; the tube's thread is a bit
+       taller than the ring.'''
+    ringHi, thredID = 0.35, thredOD-2*thredThik
+    ringOD, ringID = thredOD+thredSlop+0.20, thredOD+thredSlop
+    thredLo = baseThik + 0.05
+    thredHi = thredLo + ringHi + 0.05
+    tube = cylinderAsm([thredID-0.11]*4, [ringOD, ringOD, thredID, thredID], [0, baseThik, baseThik, thredHi])
+    tube += cachedThread(thredLo, thredID, thredThik, pitch, starts, (thredHi-thredLo)/pitch, True)
+    ring = cylinderAsm([ringID, ringID], [ringOD, ringOD-0.10], [0, ringHi])
+    ring += cachedThread(0, ringID, thredThik, pitch, starts, ringHi/pitch, False)
+    return tube, ring
+
+def sweepParts(sweep, base):
+    '''Return a list of (label, coupons) for each combination of the
+       values in dict sweep, with other params from dict base, laid
+       out in rows on one plate.  Labels give variant number and
+       swept values.'''
+    from itertools import product
+    from math import ceil, sqrt
+    from solid.utils import back, right
+    combos = [dict(base, **dict(zip(sweep, vals))) for vals in product(*sweep.values())]
+    nCols = ceil(sqrt(len(combos)))
+    cell = max(v['thredOD']+v['thredSlop'] for v in combos) + 0.30 # Ring OD + gap
+    parts = []
+    for k, v in enumerate(combos):
+        row, col = divmod(k, nCols)
+        tube, ring = couponAsm(**v)
+        label = 'v{} '.format(k) + ' '.join('{}={}'.format(n, v[n]) for n in sweep)
+        parts.append((label, back(row*cell)(right(2*col*cell)(tube) + right((2*col+1)*cell)(ring))))
+    return parts
+
 if __name__ == '__main__':
-    from jgenArg import genArg
-    args = genArg([1, 0, 1.33, 25.4])
-    makeConn = args.next()      # Generate connector if non-zero
-    makeRing = args.next()      # Generate outer ring if non-zero
-    hd = args.next()            # Hole diameter to fit
-    sf = args.next()            # Scale factor
+    from sys import argv
+    from runConfig import ConfigSchema
+    from stageProfile import StageProfile, countNodes, profileFlag, startupFlag
+    startup = startupFlag(argv) # Remove --startup-profile arg
+    profiling, profileJSON = profileFlag(argv) # Remove --profile arg
+    sweep = sweepFlags(argv)    # Remove --sweep args
+    prof = StageProfile('gen-flanged-tube3')
+    names = ('makeConn', 'makeRing', 'holeDiam', 'scaleFactor', 'splitParts')
+    schema = ConfigSchema('gen-flanged-tube3', dict(zip(names, [1, 0, 1.33, 25.4, 0]), splitBodies=0), names)
+    cfg, flubs = schema.resolve(schema.environ(), argv[1:])
+    if flubs: print ('Parameter-setting fail: {}'.format(flubs))
+    makeConn = cfg.makeConn     # Generate connector if non-zero
+    makeRing = cfg.makeRing     # Generate outer ring if non-zero
+    hd = cfg.holeDiam           # Hole diameter to fit
+    sf = cfg.scaleFactor        # Scale factor
+    splitParts = cfg.splitParts # Write per-part include files if non-zero
+    splitBodies = cfg.splitBodies # Write a file per part if non-zero
 
     # Set thread pitch
     pitch = .375                # Inches of rise per full revolution
+    starts = 3                  # Number of thread starts
+    thredSlop = 0.05            # Oversize to avoid thread binding
     
     # Set thread outer diameter, thread tooth depth, and flange base thickess
     thredOD, thredThik, baseThik = 1.33, 0.05, 0.07
-    # thread high z, low z, and its inner diameter
-    thredHi, thredLo, thredID =0.66, 0.2, thredOD-2*thredThik
-    turns = (thredHi-thredLo)/pitch
-    topThred = threadAsm(thredLo, thredID, thredThik, pitch, 3, turns, True)
+    from solid import scad_render_to_file, scale, union
+    prof.lap('import')          # (So part stages exclude SolidPython's import)
+    cylSegments, version = 60, 3
+    if sweep:
+        base = dict(thredOD=thredOD, baseThik=baseThik, thredSlop=thredSlop,
+                    pitch=pitch, starts=starts, thredThik=thredThik)
+        parts = [(label, scale((sf, sf, sf))(pair)) for label, pair in sweepParts(sweep, base)]
+        for label, pair in parts:
+            print (label)
+        asm = union()([pair for label, pair in parts])
+        prof.lap('coupons')
+        prof.count('threads', len(threadDefs))
+    else:
+        # thread high z, low z, and its inner diameter
+        thredHi, thredLo, thredID =0.66, 0.2, thredOD-2*thredThik
+        turns = (thredHi-thredLo)/pitch
+        topThred = threadAsm(thredLo, thredID, thredThik, pitch, starts, turns, True)
     
-    # Top piece: Specify inner and outer diameters, plus heights
-    diam1 = thredID
-    diam2 = diam1 - 0.11     # diam2 is diam1 minus 2 wall thicknesses
-    cdiam1, cdiam2, cHi = .6, .5, baseThik+.25
-    ddiam1, ddiam2 = cdiam1+0.07, cdiam2+0.07
-    #      ...flange.....    ....center....     ...outer tube...
-    dii = [cdiam1, cdiam1,   cdiam1, cdiam2,    diam2,    diam2]
-    doo = [1.70,   1.70,     ddiam1, ddiam2,    diam1,    diam1]
-    hss = [0.00, baseThik,   baseThik,  cHi,   baseThik,  thredHi]
-    topAsm = cylinderAsm(dii, doo, hss) # Make assembly-of-cylinders
-
-    # Bottom piece: Specify inner and outer diameters, plus heights
-    thredSlop = 0.05            # Oversize to avoid thread binding
-    # The bottom's ID is top's OD plus some slop for clearance
-    diam1, diam2 = thredOD+thredSlop+0.20, thredOD+thredSlop
-    moveTop = (doo[0]+diam1+.1)/2 # Left-shift for top & bottom parts
-    ringHi = 0.35
-    turns = ringHi/pitch
-    dii = [diam2, diam2]
-    doo = [diam1, diam1-0.10]
-    hss = [0, ringHi]
-    botAsm = cylinderAsm(dii, doo, hss) # Make assembly-of-cylinders
-    botThred = threadAsm(0, diam2, thredThik, pitch, 3, turns, False)
+        # Top piece: Specify inner and outer diameters, plus heights
+        diam1 = thredID
+        diam2 = diam1 - 0.11     # diam2 is diam1 minus 2 wall thicknesses
+        cdiam1, cdiam2, cHi = .6, .5, baseThik+.25
+        ddiam1, ddiam2 = cdiam1+0.07, cdiam2+0.07
+        #      ...flange.....    ....center....     ...outer tube...
+        dii = [cdiam1, cdiam1,   cdiam1, cdiam2,    diam2,    diam2]
+        doo = [1.70,   1.70,     ddiam1, ddiam2,    diam1,    diam1]
+        hss = [0.00, baseThik,   baseThik,  cHi,   baseThik,  thredHi]
+        topAsm = cylinderAsm(dii, doo, hss) # Make assembly-of-cylinders
+        prof.lap('connector')
+
+        # Bottom piece: Specify inner and outer diameters, plus heights
+        # The bottom's ID is top's OD plus some slop for clearance
+        diam1, diam2 = thredOD+thredSlop+0.20, thredOD+thredSlop
+        moveTop = (doo[0]+diam1+.1)/2 # Left-shift for top & bottom parts
+        ringHi = 0.35
+        turns = ringHi/pitch
+        dii = [diam2, diam2]
+        doo = [diam1, diam1-0.10]
+        hss = [0, ringHi]
+        botAsm = cylinderAsm(dii, doo, hss) # Make assembly-of-cylinders
+        botThred = threadAsm(0, diam2, thredThik, pitch, starts, turns, False)
+        prof.lap('ring')
         
-    # Assemble items and apply scale factor
-    asm, bot, top = None,  botAsm + botThred,  topThred+topAsm
-    if makeConn: asm = left(moveTop)(top)
-    if makeRing: asm = asm + bot if asm else bot
-    asm = scale((sf, sf, sf))(asm)
-    cylSegments, version = 60, 3
-    cylSet_fn = '$fn = {};'.format(cylSegments)
-    asmFile = 'flanged-tube{}.scad'.format(version)
-    scad_render_to_file(asm, asmFile, file_header=cylSet_fn, include_orig_code=False)
-    print ('Wrote scad code to {}'.format(asmFile))
+        # Assemble items and apply scale factor
+        from solid.utils import left
+        asm, bot, top = None,  botAsm + botThred,  topThred+topAsm
+        parts = []
+        if makeConn:
+            asm = left(moveTop)(top)
+            parts.append(('connector', scale((sf, sf, sf))(asm)))
+        if makeRing:
+            asm = asm + bot if asm else bot
+            parts.append(('ring', scale((sf, sf, sf))(bot)))
+        asm = scale((sf, sf, sf))(asm)
+    cylSet_fn = '$fn = {};'.format(cylSegments) + threadModules()
+    asmFile = 'flanged-tube{}{}.scad'.format(version, '-sweep' if sweep else '')
+    if splitBodies:
+        from scadParts import writeBodies
+        bodies = {label.split()[0]: [obj] for label, obj in parts}
+        for fiName, n, wrote in writeBodies(bodies, asmFile, cylSet_fn):
+            print ('{} {}'.format('Wrote' if wrote else 'Kept ', fiName))
+    elif splitParts:
+        from scadParts import writeSplitScad
+        nNew, nOld, nGone = writeSplitScad(parts, asmFile, cylSet_fn)
+        print ('Wrote {} new parts ({} unchanged, {} removed) for {}'.format(nNew, nOld, nGone, asmFile))
+    else:
+        scad_render_to_file(asm, asmFile, file_header=cylSet_fn, include_orig_code=False)
+        print ('Wrote scad code to {}'.format(asmFile))
+    prof.lap('render')
+    if profiling:
+        prof.count('parts', len(parts))
+        prof.count('nodes', countNodes(asm))
+        prof.report(profileJSON)
+    if startup:
+        startup.report()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+'''Benchmark pipeVue0 on synthetic designs of increasing size, record
+stage times and output sizes, and compare them with an earlier run
+to catch scaling regressions.'''
+
+# Params are keyword=value forms, in any order:
+#   kinds=tarray,rings,dense   Which synthetic design kinds to run
+#   sizes=5,10,20              Scale values to run for each kind
+#   out=bench-pipeVue.json     File to record results in
+#   compare=old.json           Earlier results file to compare with
+#   tol=1.3                    Slowdown ratio counted as a regression
+#   runs=5                     Runs per design; the fastest and
+#                              slowest time of each stage are recorded
+#   keep=f                     If t, keep generated scripts & scad
+# (Params can also come from BENCHPIPEVUE_<name> environment variables;
+# see runConfig.py.)
+#
+# Design kinds, for scale n:
+#   tarray -- T array of n rows by n columns (about n*n posts), with
+#             explicit edges along each row and between rows
+#   rings  -- n nested pentagon-symmetric P rings (5k posts in ring
+#             k, like eg-freq-6-auto) with auto-added edges
+#   dense  -- T array of n by n posts, with autoTol big enough to
+#             auto-add edges to each post's first 3 neighbour ranks
+#
+# Each run is a separate `python3 pipeVue0.py f=... profile=X.json`,
+# so times include startup.  Per-stage times come from the profile
+# report.  Single runs can vary by more than tol from run to run, and
+# the machine's speed can drift between benchmark runs, so: each
+# design runs several times; and compare scales old times by the
+# ratio of new to old import times (the import stage loads SolidPython,
+# which pipeVue0 changes don't affect, so it serves as a yardstick of
+# machine speed in each run's own process).  A stage (or wall
+# time) counts as a regression only if its fastest time now is over
+# tol times the old fastest time, is slower than the old slowest time,
+# and is at least 20 ms more than the old fastest time (old times
+# being scaled).  Designs with regressions get run again, and only
+# regressions found both times are reported.  Exit status is 1 if compare
+# finds any regression.
+
+import json, os, subprocess, sys, tempfile
+from time import perf_counter
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from runConfig import ConfigSchema
+
+def tarrayScript(n):
+    '''Return a T-array script with explicit row and cross-row edges'''
+    lines = ['=P', '  postList=f cylList=f', '=L', f'T{n},{n},.1,.0866;', '=C']
+    # Row r of T array has n posts if r is even, else n+1 posts
+    starts, k = [], 0
+    for r in range(n):
+        starts.append(k)
+        k += n + (r&1)
+    for r in range(n):
+        a, roLen = starts[r], n + (r&1)
+        lines.append(' '.join(f'{a+c} {a+c+1};' for c in range(roLen-1)))
+        if r+1 < n:
+            # Post c of the even row of a row pair is next to posts c
+            # and c+1 of the odd row
+            e, o = (a, starts[r+1]) if r&1==0 else (starts[r+1], a)
+            lines.append(' '.join(f'{e+c} {o+c}; {e+c} {o+c+1};' for c in range(n)))
+    return '\n'.join(lines) + '\n'
+
+def ringsScript(n):
+    '''Return a nested-rings script with auto-added edges'''
+    lines = ['=P', '  postList=f cylList=f autoTol=72', '=L', 'B 0 0 .5;  C 0,0,0;']
+    for k in range(1, n+1):
+        lines.append(f'B 0 0 {0.5-0.08*k:0.2f};  P{5*k},{0.5*k},{(k&1)*36/k:0.3f};')
+    lines.append('=C')
+    return '\n'.join(lines) + '\n'
+
+def denseScript(n):
+    '''Return a T-array script with many auto-added edges'''
+    return f'=P\n  postList=f cylList=f autoTol=20.5\n=L\nT{n},{n},.1,.0866;\n=C\n'
+
+makers = {'tarray': tarrayScript, 'rings': ringsScript, 'dense': denseScript}
+
+def runOne(kind, n, workDir, runs=5):
+    '''Run pipeVue0 runs times on a design of given kind and scale;
+    return a dict of results, with the minimum (and in stagesMax, the
+    maximum) time of each stage'''
+    pipeVue = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeVue0.py')
+    scriptFi = f'bench-{kind}-{n}'
+    with open(os.path.join(workDir, scriptFi), 'w') as fo:
+        fo.write(makers[kind](n))
+    walls, stages, stagesMax = [], {}, {}
+    for k in range(max(1, runs)):
+        t = perf_counter()
+        done = subprocess.run([sys.executable, pipeVue, f'f={scriptFi}', 'profile=prof.json'],
+                              cwd=workDir, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        walls.append(perf_counter() - t)
+        if done.returncode:
+            print (f'{kind} {n}: pipeVue0 failed:\n{done.stderr}')
+            return None
+        with open(os.path.join(workDir, 'prof.json')) as fi:
+            prof = json.load(fi)
+        for st, v in prof['stages'].items():
+            stages[st] = min(v, stages.get(st, v))
+            stagesMax[st] = max(v, stagesMax.get(st, v))
+    stagesMax['wall'] = round(max(walls), 4)
+    return {'kind': kind, 'size': n, 'wall': round(min(walls), 4), 'runs': len(walls),
+            'stages': stages, 'stagesMax': stagesMax, 'counts': prof['counts'],
+            'peakMemMB': prof['peakMemMB'],
+            'scadBytes': os.path.getsize(os.path.join(workDir, 'pipeVue0.scad'))}
+
+def compareResults(new, old, tol):
+    '''Return list of ((kind, size), text) regressions of new results vs old:
+    stages (or wall time) whose fastest time is more than tol times
+    the old fastest, slower than the old slowest, and at least 20 ms
+    more than the old fastest; or output sizes that changed.  Old
+    times are scaled by the ratio of new to old import times.'''
+    oldBy = {(r['kind'], r['size']): r for r in old}
+    flubs = []
+    for r in new:
+        o = oldBy.get((r['kind'], r['size']))
+        if not o: continue
+        times = dict(r['stages'], wall=r['wall'])
+        newImp, oldImp = r['stages'].get('import'), o['stages'].get('import')
+        speed = newImp/oldImp if newImp and oldImp else 1
+        oldTimes = {st: speed*t for st, t in dict(o['stages'], wall=o['wall']).items()}
+        oldMax = {st: speed*t for st, t in o.get('stagesMax', {}).items()}
+        for st, t in times.items():
+            ot = oldTimes.get(st)
+            if ot is not None and t > max(tol*ot, oldMax.get(st, ot)) and t-ot > 0.02:
+                flubs.append(((r['kind'], r['size']), f'{st} {ot:0.3f} -> {t:0.3f} s'))
+        if r['scadBytes'] != o['scadBytes']:
+            flubs.append(((r['kind'], r['size']), f'scad size {o["scadBytes"]} -> {r["scadBytes"]}'))
+    return flubs
+
+def showResult(r):
+    c, st = r['counts'], r['stages']
+    times = ' '.join(f'{k} {v:6.3f}' for k, v in st.items())
+    print (f'{r["kind"]:7} {r["size"]:4}  posts {c.get("posts",0):6}  edges {c.get("edges",0):7}  '
+           f'{times}  wall {r["wall"]:6.3f}  scad {r["scadBytes"]/1e6:7.2f} MB')
+
+if __name__ == '__main__':
+    schema = ConfigSchema('benchPipeVue', dict(kinds='tarray,rings,dense', sizes='5,10,20',
+                          out='bench-pipeVue.json', compare='', tol=1.3, runs=5, keep=False))
+    par, flubs = schema.resolve(schema.environ(), sys.argv[1:])
+    if flubs:
+        sys.exit(f'Parameter-setting fail: {flubs}; params are {" ".join(schema.defaults)}')
+    kinds = par.kinds.split(',')
+    sizes = [int(s) for s in par.sizes.split(',')]
+    workDir = tempfile.mkdtemp(prefix='benchPipeVue-')
+    results = []
+    for kind in kinds:
+        for n in sizes:
+            r = runOne(kind, n, workDir, par.runs)
+            if r:
+                showResult(r)
+                results.append(r)
+    with open(par.out, 'w') as fo:
+        json.dump(results, fo, indent=1)
+    print (f'Wrote results to {par.out}')
+    flubs = []
+    if par.compare:
+        with open(par.compare) as fi:
+            old = json.load(fi)
+        tol = par.tol
+        flubs = compareResults(results, old, tol)
+        suspects = sorted(set(key for key, text in flubs))
+        if suspects:            # Run again, to weed out noise
+            print (f'Rerunning {len(suspects)} designs with possible regressions')
+            again = [runOne(kind, n, workDir, par.runs) for kind, n in suspects]
+            still = set(key for key, text in compareResults([r for r in again if r], old, tol))
+            flubs = [(key, text) for key, text in flubs if key in still]
+        for (kind, n), text in flubs:
+            print (f'Regression? {kind} {n}: {text}')
+    if par.keep:
+        print (f'Kept scripts and output in {workDir}')
+    else:
+        for fi in os.listdir(workDir):
+            os.remove(os.path.join(workDir, fi))
+        os.rmdir(workDir)
+    if flubs:
+        sys.exit(1)
+    if par.compare:
+        print (f'No regressions vs {par.compare}')
@@ -11,18 +11,33 @@ visualization of arrangements of edges in geodesic dome structures.'''
 
 #  A layout script tells where to locate posts.  It has entries with
 #  type of pattern (polygon, rectangular grid, triangular grid),
-#  numbers of corners, rows, or columns, and radius or spacing.
+#  numbers of corners, rows, or columns, and radius or spacing.  Code
+#  G (geodesic sphere or dome; see eg-geodesic-6) also makes edges.
 
 #  A cylinders script tells what post-to-post cylinders to make.  It
 #  has entries with optional <color>, <diam>, <post>, and <level>
 #  elements.  Each semicolon terminator invokes cylinder production.
 
 # Optional params for __main__:
-#    designNum/name, endGap, postHi, pDiam, qDiam, SF
+#    designNum/name, endGap, postHi, pDiam, qDiam, SF, splitParts, profile,
+#    autoTol, autoList, autoScan, adjFile, designOut, preview,
+#    previewSegments, groupColors, splitBodies, clearance, splitSize
 
 # [parameter handling revision, 12 Feb: allow params in any order; but
 # require keyword=value forms -- eg `pDiam=0.07` -- where keyword
 # should exactly match the name of a variable in the program.]
+# Params are declared in paramSchema (see runConfig.py), and come from
+# its defaults, then the script file's =P section (or a .pvd file's
+# params), then PIPEVUE0_<name> environment variables, then the
+# command line, each overriding the ones before.  They are resolved
+# once per run into an immutable Config, cfg.
+
+#  As a library: dz = loadDesign(f); cfg, flubs = designConfig(dz,
+#  params); then renderScad(cfg, dz) returns SCAD text.  All state of
+#  a render lives in a PipeVueEngine, not in module globals, so
+#  renders can run at the same time in threads or asyncio tasks (eg
+#  via loop.run_in_executor).  Parsed script files are shared between
+#  them through scriptCache.
 
 #  The command-line parameters default to designNum=0, endGap=.03,
 #  postHi=.24, pDiam=.06, qDiam=.02, and SF=100 respectively, which
@@ -35,6 +50,90 @@ visualization of arrangements of edges in geodesic dome structures.'''
 #  cylinders.  Else, the first parameter should be the name of a file
 #  containing a layout script and a cylinders script.
 
+#  With splitParts=t, output goes into include files in directory
+#  pipeVue{version}-parts, with pipeVue{version}.scad including them.
+#  Posts go into files of about splitSize posts each (default 200),
+#  and each colour's tubes and labels into files of about splitSize
+#  objects, each object's file picked by a hash of its code.  Only
+#  files whose content changed get rewritten, so OpenSCAD can reuse
+#  cached results for the rest, and the main file stays short.  See
+#  scadParts.py.
+
+#  With groupColors=t, tubes go into one color(){ union(){...} } block
+#  per colour and thickness, instead of each tube getting its own
+#  color(); the number of tubes in each group gets printed.  This cuts
+#  node count and speeds OpenSCAD preview.  Groups are added at the
+#  end of the cylinders stage, in order of each group's first tube, so
+#  tubes come after all posts and labels in the .scad output instead
+#  of in script order; the shape is the same but the text differs from
+#  ungrouped output.  With splitParts=t, each group is one object in
+#  its colour's part files (so editing one tube rewrites the file
+#  holding its whole group).  With
+#  splitBodies=t, each group goes into its colour's body file.
+
+#  With splitBodies=t, each colour's tubes (and labels) go into their
+#  own self-contained file, pipeVue{version}-{colour}.scad, and posts
+#  go into pipeVue{version}-posts.scad, for slicing and printing each
+#  material separately.  The design is parsed and built once, and
+#  each body file is rendered from it (see writeBodies in scadParts.py).
+
+#  With clearance=c (c >= 0; unscaled, like endGap), after cylinders
+#  are made and before any output is written, tubes are checked for
+#  intersections with each other, and for near misses where the gap
+#  between tube surfaces is less than SF*c.  Each tube is treated as
+#  a capsule (its axis segment and radius); a spatial hash of the
+#  segments limits which pairs get compared.  Tubes that share an end
+#  post aren't compared, since they meet at the post anyway.  Eg,
+#  `pipeVue0.py f=eg-two-rings endGap=0 clearance=.01`.
+
+#  With preview=t, a low-detail copy of the design also goes to
+#  pipeVue{version}-preview.scad, for responsive OpenSCAD previews of
+#  big models: posts and tubes have previewSegments sides (default 6),
+#  post labels are left out, and tubes are merged into one union per
+#  colour.  The full-detail output is unchanged.
+
+#  With profile=t, a one-line summary of stage times (import, load,
+#  layout, cylinders, render; import is the first load of SolidPython,
+#  timed on its own so it doesn't inflate layout; cylinders.auto is
+#  the auto-add part of cylinders), counts, and peak memory gets printed.  With
+#  profile=X.json, a JSON report also goes to file X.json (any file
+#  name ending in .json, eg profile=nodes.json; values '', 0, f,
+#  false, n, and no leave profiling off).  With
+#  --startup-profile, a breakdown of import times gets printed.
+
+#  With autoScan=k, instead of auto-adding edges and writing scad
+#  output, pipeVue lists the k smallest distinct post-to-post
+#  distances, with numbers of post pairs at each distance and running
+#  totals, and for each the autoTol value that cuts between it and the
+#  next distance.  It also notes where the total reaches or exceeds
+#  the edge count of a triangulation of the posts.
+
+#  An edge in the cylinders script that repeats an earlier edge (same
+#  two posts at the same levels, in either order) is skipped, and the
+#  number skipped gets reported.  With adjFile=X.json, post positions
+#  and post adjacency (over all edges made, including auto-added ones)
+#  go to file X.json in CSR form: neighbours of post p are
+#  indices[indptr[p]:indptr[p+1]].
+
+#  With designOut=X.pvd, the resolved design -- scaled post
+#  positions, each edge made with its colour, thickness, and levels,
+#  and the parameters used -- goes to binary file X.pvd (see
+#  pipeDesign.py).  With f=X.pvd, pipeVue renders that design without
+#  parsing scripts, auto-adding, or checking for duplicates; params
+#  given on the command line override its params.
+
+#  In a script file, a line `=I fileName` includes the sections of
+#  another script file (relative to the including file's directory)
+#  at that point.  Lines from `=D name p1 p2 ...` up to `=E` define a
+#  macro; then `=M name v1 v2 ...` adds the macro's lines to the
+#  current section, with $p1, $p2 ... replaced by v1, v2 ...  Parsed
+#  files are cached by path and reused while unchanged, so a block
+#  shared by several designs is read and parsed once per process.
+#  Files are memory-mapped, and section texts get decoded a chunk at a
+#  time as doLayout and doCylinders scan them, so memory use for huge
+#  generated =C sections stays near the file size.
+#  See eg-include-macro.
+
 #  Note, an end gap is a small gap between a post and a cylinder end.
 #  With endGap=3, a gap of about 6 units is drawn between the ends of
 #  cylinders meeting at the same point.  With endGap=0, there'd be no
@@ -55,11 +154,22 @@ visualization of arrangements of edges in geodesic dome structures.'''
 # (c) In openscad, press F6 to render details, then Export, as STL.
 # (d) Say `craftware $STF &` then slice it and save gcode
 
-from solid import cylinder, translate, rotate, scad_render_to_file, color, text
-from solid.utils import down, up, left
-from sys import argv
+# SolidPython is imported where first used, not here.
+from sys import argv, path
+from os.path import abspath, dirname, getmtime, join
+path.append(dirname(dirname(abspath(__file__)))) # For shared modules
+from stageProfile import StageProfile, countNodes, startupFlag
 from math import sqrt, pi, cos, sin, asin, atan2
 from collections import namedtuple
+from itertools import chain
+import json
+from hashlib import sha1
+from mmap import mmap, ACCESS_READ
+from codecs import getincrementaldecoder
+from string import Template
+from scadParts import writeBodies, writeSplitScad
+from pipeDesign import Resolved, readDesign, writeDesign
+from runConfig import ConfigSchema, isTrue
 
 Point  = namedtuple('Point',  'x,y,z')
 #  Design elements cSides, nPosts, pLayout, cSpec are two integers and
@@ -68,8 +178,8 @@ Point  = namedtuple('Point',  'x,y,z')
 #  total number of posts.  pLayout is a script for arrangement of
 #  posts.  cSpec is a script for cylinders between points on posts.
 #  Re script contents, see `spec-layout-script.odt`.
-Design = namedtuple('Design', 'pLayout, cSpec')
-Layout = namedtuple('Layout', 'BP, posts')
+Design = namedtuple('Design', 'pLayout, cSpec, params', defaults=('',))
+Layout = namedtuple('Layout', 'BP, posts, edges') # edges: (m,n) post pairs
 
 def rotate2(a,b,theta):
     st = sin(theta)
@@ -79,7 +189,123 @@ def rotate2(a,b,theta):
 def ssq(x,y,z):    return x*x + y*y + z*z
 def sssq(x,y,z):   return sqrt(ssq(x,y,z))
 
-def produceOut(code, numText, LO):
+def segDist2(p1, q1, p2, q2):
+    '''Return squared distance between segments p1-q1 and p2-q2 (3D
+    points as tuples), via their closest points'''
+    d1 = [b-a for a, b in zip(p1, q1)]
+    d2 = [b-a for a, b in zip(p2, q2)]
+    r  = [a-b for a, b in zip(p1, p2)]
+    a, e, f = ssq(*d1), ssq(*d2), sum(x*y for x, y in zip(d2, r))
+    c, b = sum(x*y for x, y in zip(d1, r)), sum(x*y for x, y in zip(d1, d2))
+    eps = 1e-12
+    if a <= eps and e <= eps:
+        s = t = 0
+    elif a <= eps:
+        s, t = 0, min(1, max(0, f/e))
+    else:
+        if e <= eps:
+            s, t = min(1, max(0, -c/a)), 0
+        else:
+            denom = a*e - b*b   # Zero if segments are parallel
+            s = min(1, max(0, (b*f - c*e)/denom)) if denom > eps else 0
+            t = (b*s + f)/e
+            if t < 0:
+                s, t = min(1, max(0, -c/a)), 0
+            elif t > 1:
+                s, t = min(1, max(0, (b-c)/a)), 1
+    return ssq(*[x + s*u - y - t*v for x, u, y, v in zip(p1, d1, p2, d2)])
+
+def tubeClashes(segs, clearance):
+    '''Return sorted list of (gap, i, j) for tubes i < j whose surfaces
+    are less than clearance apart (gap < 0 if they intersect).  segs is
+    a list of (m, n, p, q, radius) for tubes from post m to post n with
+    axis p-q.  Segments go into a hash of cubes about one average tube
+    length on a side, by bounding box; only tubes sharing a cube and
+    not sharing a post get compared.'''
+    if len(segs) < 2: return []
+    rmax = max(rad for m, n, p, q, rad in segs)
+    reach = rmax + clearance    # Half of largest surface-to-axis reach
+    side = max(sum(sssq(*[b-a for a, b in zip(p, q)]) for m, n, p, q, rad in segs)/len(segs),
+               2*reach, 1e-6)
+    grid = {}
+    for i, (m, n, p, q, rad) in enumerate(segs):
+        lo = [int((min(a, b) - reach)//side) for a, b in zip(p, q)]
+        hi = [int((max(a, b) + reach)//side) for a, b in zip(p, q)]
+        for x in range(lo[0], hi[0]+1):
+            for y in range(lo[1], hi[1]+1):
+                for z in range(lo[2], hi[2]+1):
+                    grid.setdefault((x, y, z), []).append(i)
+    seen, clashes = set(), []
+    for ids in grid.values():
+        for k, i in enumerate(ids):
+            mi, ni, pi, qi, ri = segs[i]
+            for j in ids[k+1:]:
+                if (i, j) in seen: continue
+                seen.add((i, j))
+                mj, nj, pj, qj, rj = segs[j]
+                if {mi, ni} & {mj, nj}: continue
+                lim = ri + rj + clearance
+                d2 = segDist2(pi, qi, pj, qj)
+                if d2 < lim*lim:
+                    clashes.append((sqrt(d2) - ri - rj, i, j))
+    clashes.sort()
+    return clashes
+
+def adjacencyCSR(edges, nPosts):
+    '''Return (indptr, indices) lists giving post adjacency in CSR
+    form: neighbours of post p are indices[indptr[p]:indptr[p+1]], in
+    ascending order.  edges is a set of (m, n) post-number pairs.'''
+    nbrs = [[] for p in range(nPosts)]
+    for m, n in edges:
+        nbrs[m].append(n)
+        nbrs[n].append(m)
+    indptr, indices = [0], []
+    for nb in nbrs:
+        indices.extend(sorted(nb))
+        indptr.append(len(indices))
+    return indptr, indices
+
+def geodesic(freq, zmin):
+    '''Return (vertices, edges) of a class I geodesic subdivision, of
+    frequency freq, of an icosahedron with a vertex at the top, projected
+    onto the unit sphere.  Only vertices with z >= zmin are kept, and
+    edges between them.  Vertices are (x,y,z) triples, ordered from the
+    top down and ring by ring; edges are (m,n) pairs of vertex numbers.'''
+    freq = max(1, freq)
+    zr, rr = 1/sqrt(5), 2/sqrt(5) # Heights and radii of ico rings
+    ico = [(0,0,1)] + [(rr*cos(k*pi/5), rr*sin(k*pi/5), zr*(-1)**k) for k in range(10)] + [(0,0,-1)]
+    up, dn = [1,3,5,7,9], [2,4,6,8,10]
+    faces = []
+    for k in range(5):
+        u, u2, d, d2 = up[k], up[(k+1)%5], dn[k], dn[(k+1)%5]
+        faces += [(0, u, u2), (u, d, u2), (u2, d, d2), (11, d2, d)]
+    verts, keys, edges = [], {}, set()
+    def vertex(face, i, j):   # Number of vertex i/freq along AB, j/freq along AC
+        a, b, c = face
+        key = tuple(sorted((v, w) for v, w in ((a, freq-i-j), (b, i), (c, j)) if w))
+        if key not in keys:
+            x, y, z = (sum(w*ico[v][t] for v, w in key) for t in range(3))
+            norm = sssq(x, y, z)
+            keys[key] = len(verts)
+            verts.append((x/norm, y/norm, z/norm))
+        return keys[key]
+    for face in faces:
+        for i in range(freq+1):
+            for j in range(freq+1-i):
+                p = vertex(face, i, j)
+                if i+j < freq:
+                    q, r = vertex(face, i+1, j), vertex(face, i, j+1)
+                    edges.update({(min(p,q), max(p,q)), (min(p,r), max(p,r)), (min(q,r), max(q,r))})
+    # Keep vertices with z >= zmin, ordered by height then azimuth
+    eps = 1e-9
+    kept = [v for v in range(len(verts)) if verts[v][2] >= zmin-eps]
+    kept.sort(key=lambda v: (-round(verts[v][2], 9), round(atan2(verts[v][1], verts[v][0])%(2*pi), 9)))
+    renum = {v: k for k, v in enumerate(kept)}
+    edges = sorted((min(renum[m], renum[n]), max(renum[m], renum[n]))
+                   for m, n in edges if m in renum and n in renum)
+    return [verts[v] for v in kept], edges
+
+def produceOut(code, numText, LO, say=print):
     BP, posts = LO.BP, LO.posts
     bx, by, bz = BP.x, BP.y, BP.z
     nn = len(numText)
@@ -91,13 +317,13 @@ def produceOut(code, numText, LO):
             for ns in numText:
                 nums.append(float(ns))
         except ValueError:
-            print (f'Anomaly: code {code}, {numText} has wrong count or format')
+            say (f'Anomaly: code {code}, {numText} has wrong count or format')
             return None
         return nums
     
     if code=='B':               # Set base point, BP
         nums = getNums(3,3)     # Need exactly 3 numbers
-        if nums: return Layout(Point(*nums), posts)
+        if nums: return LO._replace(BP=Point(*nums))
 
     if code=='C':               # Create a collection of posts
         nums = getNums(3,33333) # Need at least 3 numbers
@@ -107,8 +333,8 @@ def produceOut(code, numText, LO):
                 posts.append(Point(x,y,z))
                 nums = nums[3:]
             if len(nums)>0:
-                print (f'Anomaly: code {code}, {numText} has {nums} left over')
-            return Layout(BP, posts)
+                say (f'Anomaly: code {code}, {numText} has {nums} left over')
+            return LO
 
     if code=='L':               # Create a line of posts
         nums = getNums(4,4)     # Need exactly 4 numbers
@@ -118,7 +344,7 @@ def produceOut(code, numText, LO):
             for k in range(n):
                 x, y, z = x+dx, y+dy, z+dz
                 posts.append(Point(x,y,z))
-            return Layout(BP, posts)
+            return LO
 
     if code=='P':               # Create a polygon of posts        
         nums = getNums(3,3)     # Need exactly 3 numbers
@@ -130,6 +356,17 @@ def produceOut(code, numText, LO):
                 posts.append(Point(bx+x, by+y, bz))
                 x, y = rotate2(x, y,theta)
     
+    if code=='G':               # Create a geodesic sphere or dome
+        nums = getNums(2,3)     # Need 2 or 3 numbers
+        if nums:
+            freq, r, zmin = int(nums[0]), nums[1], (nums+[-1])[2]
+            verts, edges = geodesic(freq, zmin)
+            base = len(posts)
+            for x, y, z in verts:
+                posts.append(Point(bx+r*x, by+r*y, bz+r*z))
+            LO.edges.extend((base+m, base+n) for m, n in edges)
+            return LO
+
     if code in 'RT':            # Create an array of posts
         nums = getNums(4,4)     # Need exactly 4 numbers
         if nums:
@@ -144,78 +381,344 @@ def produceOut(code, numText, LO):
                     posts.append(Point(x,y,z))
                     x += dx
                 y += dy
-            return Layout(BP, posts)
+            return LO
     return LO                   # No change if we fail or fall thru
 
-def isTrue(x):
-    '''Return false if x is None, or False, or an empty string, or a
-    string beginning with f, F, N, or n.  Else, return True.    '''
-    return not str(x)[:1] in 'fFNn'
-
-def levelLet(lev):
-    deltaHi = SF*postHi/(len(levels)-1)
-    return (ord(lev)-ord(levels[0]))*deltaHi
-
-def thickLet(thix):
-    if thix=='p':
-        return SF*pDiam
-    else: # diameters q, r, s, t... scale geometrically
-        expo = max(0, ord(thix)-ord('q'))
-        return SF * qDiam * pow(dRatio,expo)
-        
-def doLayout(dz):
-    LO = Layout(Point(0,0,0), [])
-    pc, code, numbers = '?', '?', []
-    codes, digits = 'BCLPRT', '01234356789+-.'
-    
-    for cc in dz.pLayout:       # Process current character
-        # Add character to number, or store a number?
-        if cc in digits:
-            num = num + cc if pc in digits else cc
-        elif pc in digits:
-            numbers.append(num) # Add number to list of numbers
-
-        # Process a completed entry, or start a new entry?
-        if cc==';':
-            LO = produceOut(code, numbers, LO)
-        elif cc in codes:
-            pc, code, numbers = '?', cc, []
-        pc = cc                 # Prep to get next character
-        
-    # Now LO has an unscaled points list.  Create and return CSG
-    posts = LO.posts
-    for k in range(len(posts)):
-        p = posts[k]
-        p = Point(SF*p.x, SF*p.y, SF*p.z)
-        posts[k] = p
-        if isTrue(postList):
-            #print (f'Post {k:<3} ({p.x:8.2f}, {p.y:8.2f}, {p.z:8.2f} )')
-            print (f'p{k:<2}=Point( {p.x:8.2f}, {p.y:8.2f}, {p.z:8.2f})')
-    assembly = None
-    for k, p in enumerate(posts):
-        tube = cylinder(d=SF*postDiam, h=SF*postHi)
-        cyli = translate([p.x, p.y, p.z])(tube)
-        assembly = assembly + cyli if assembly else cyli
-        if isTrue(postLabel):
-            cName = colorSet['B']
-            thik  = thickLet('t')
-            zd    = levelLet('e')
-            for cc in postLabel:
-                if cc in colors: cName = colorSet[cc]
-                if cc in thixx:  thik  = thickLet(cc)
-                if cc in levels: zd = levelLet(cc)
-            tx =  color(cName)(text(text=str(k),size=thik))
-            tr = translate([p.x-thik*(1+len(str(k))), p.y, zd+p.z])(tx)
-            assembly = assembly + tr
-
-    return assembly, Layout(LO.BP, posts)
-
-def doCylinders(dz, LO, assembly):
-    def oneCyl(listIt):   # Return a cylinder & its end-post #'s
-        m, n = int(post1)%nPosts, int(post2)%nPosts
+def nearPairs(posts, cutoff):
+    '''Return sorted list of (pn, qn, d2) for posts pn < qn that are
+    within distance cutoff of each other, d2 being distance squared.
+    Uses a grid of cubes of side cutoff as a spatial index, so only
+    posts in the same or adjacent cubes get compared.'''
+    if cutoff <= 0: return []
+    grid = {}
+    for pn, p in enumerate(posts):
+        key = (int(p.x//cutoff), int(p.y//cutoff), int(p.z//cutoff))
+        grid.setdefault(key, []).append(pn)
+    pairs, cutoff2 = [], cutoff*cutoff
+    steps = (-1, 0, 1)
+    for (i,j,k), pns in grid.items():
+        near = [qn for di in steps for dj in steps for dk in steps
+                for qn in grid.get((i+di, j+dj, k+dk), ())]
+        for pn in pns:
+            p = posts[pn]
+            for qn in near:
+                if qn <= pn: continue
+                q = posts[qn]
+                d2 = ssq(p.x-q.x, p.y-q.y, p.z-q.z)
+                if d2 <= cutoff2: pairs.append((pn, qn, d2))
+    pairs.sort()
+    return pairs
+
+def hullCount(posts):
+    '''Return number of posts on the boundary of the convex hull of
+    the posts' x,y positions, counting posts along hull edges'''
+    pts = sorted(set((p.x, p.y) for p in posts))
+    if len(pts) < 3: return len(pts)
+    def cross(o, a, b): return (a[0]-o[0])*(b[1]-o[1]) - (a[1]-o[1])*(b[0]-o[0])
+    def chain(pts):
+        h = []
+        for p in pts:
+            while len(h) > 1 and cross(h[-2], h[-1], p) < -1e-9: h.pop()
+            h.append(p)
+        return h
+    lo, hi = chain(pts), chain(pts[::-1])
+    return max(len(pts) if len(lo)==len(pts) else 0, len(lo) + len(hi) - 2)
+
+def reportRanks(posts, nRanks, Lmax, say=print):
+    '''Print the nRanks smallest distinct post-to-post distances, with
+    numbers of post pairs at each, and autoTol values that cut between
+    ranks.  Search radius grows until nRanks+1 ranks are found.'''
+    nPosts = len(posts)
+    if nPosts < 2: return
+    ext = sorted(max(c)-min(c) for c in zip(*posts))
+    span = sssq(*ext)
+    r = sqrt(max(ext[2]*ext[1], ext[2]**2/nPosts)/nPosts) or span
+    while True:
+        ranks = []              # [distance, pairs] per distinct distance
+        for pn, qn, d2 in sorted(nearPairs(posts, r), key=lambda e: e[2]):
+            d = sqrt(d2)
+            if ranks and d - ranks[-1][0] <= 1e-6*max(1, d):
+                ranks[-1][1] += 1
+            else:
+                ranks.append([d, 1])
+        if len(ranks) > nRanks or r >= span: break
+        r *= 1.5
+    bound = 3*nPosts - 3 - hullCount(posts)
+    say (f'Distance ranks for {nPosts} posts; Lmax {Lmax:0.2f}; a triangulation '
+           f'would have {bound} edges (3*posts - 3 - {hullCount(posts)} hull posts)')
+    say ('Rank  Distance  Pairs  Total   autoTol cut')
+    total = 0
+    for k, (d, n) in enumerate(ranks[:nRanks]):
+        total += n
+        cut = ''
+        if k+1 < len(ranks):
+            cut = f'{(d+ranks[k+1][0])/2 - Lmax:9.2f}'
+            if total > bound: cut += '  too many edges'
+            elif total == bound: cut += '  edge count of a triangulation'
+        say (f'{k+1:4} {d:9.2f} {n:6} {total:6}  {cut}')
+
+class ScriptText:
+    '''Text of a script section, held as a list of pieces: strings, or
+    memoryviews into a memory-mapped script file.  Iterating gives the
+    characters of the text, decoding mapped pieces a chunk at a time,
+    so a huge section never gets built as one string.'''
+    chunk = 1 << 20
+    def __init__(self, pieces):
+        self.pieces = pieces
+    def chunks(self):
+        '''Yield the text as a series of strings'''
+        for p in self.pieces:
+            if isinstance(p, str):
+                yield p
+                continue
+            dec = getincrementaldecoder('utf-8')()
+            for k in range(0, len(p), self.chunk):
+                yield dec.decode(p[k:k+self.chunk], k+self.chunk >= len(p))
+    def __iter__(self):
+        return chain.from_iterable(self.chunks())
+    def __str__(self):
+        return ''.join(p if isinstance(p, str) else str(p, 'utf-8') for p in self.pieces)
+
+def parseScript(fiName):
+    '''Return list of entries parsed from script file fiName: (mode,
+    text) for runs of parameter (mode 1), layout (2), or cylinder (3)
+    lines; ('I', fileName) for an include; ('D', name, params, body)
+    for a macro definition; ('M', mode, name, args) for a macro use.
+    Results are cached by file path, and reused while the file's mtime,
+    or failing that its content hash, is unchanged.
+
+    The file is memory-mapped, and only its `=` lines get scanned in
+    python; texts of runs are memoryviews into the mapped file.'''
+    path = abspath(fiName)
+    mtime = getmtime(path)
+    hit = scriptCache.get(path)
+    if hit and hit[0] == mtime:
+        return hit[2]
+    with open(path, 'rb') as fi:
+        try:
+            data = mmap(fi.fileno(), 0, access=ACCESS_READ)
+        except ValueError:      # Can't map an empty file
+            data = b''
+    digest = sha1(data).digest()
+    if hit and hit[1] == digest:
+        scriptCache[path] = (mtime, digest, hit[2])
+        return hit[2]
+    entries, mode, body = [], 0, None # Start out in comments mode
+    view, pos, n = memoryview(data), 0, len(data)
+    while pos < n:
+        if data[pos:pos+1] == b'=':  # Detect section change vs comment ...
+            eol = data.find(b'\n', pos)
+            end = n if eol < 0 else eol+1
+            line, pos = data[pos:end].decode(), end
+            l2, words = line[:2], line[2:].split()
+            if body is not None: # In a macro definition
+                if l2 == '=E':
+                    entries.append(('D', name, params, ''.join(body)))
+                    body = None
+            elif l2=='=P': mode = 1 # Parameters
+            elif l2=='=L': mode = 2 # Layout
+            elif l2=='=C': mode = 3 # Cylinders
+            elif l2=='=I' and words: entries.append(('I', words[0]))
+            elif l2=='=D' and words: name, params, body = words[0], words[1:], []
+            elif l2=='=M' and words: entries.append(('M', mode, words[0], words[1:]))
+            continue
+        eol = data.find(b'\n=', pos) # Lines up to next `=` line
+        end = n if eol < 0 else eol+1
+        if body is not None:
+            body.append(data[pos:end].decode())
+        elif mode:
+            entries.append((mode, view[pos:end]))
+        pos = end
+    if body is not None:
+        entries.append(('D', name, params, ''.join(body)))
+    scriptCache[path] = (mtime, digest, entries)
+    return entries
+
+def expandScript(fiName, secs, macros, active, say=print):
+    '''Append text of script file fiName, with includes and macro uses
+    expanded, to lists secs[1], secs[2], secs[3] (params, layout, and
+    cylinders).  macros maps names to (params, body) pairs.  active
+    is the list of files being expanded, to catch include loops.'''
+    path = abspath(fiName)
+    if path in active:
+        say (f'Anomaly: {fiName} includes itself; include skipped')
+        return
+    active.append(path)
+    for e in parseScript(path):
+        if e[0] == 'I':
+            try:
+                expandScript(join(dirname(path), e[1]), secs, macros, active, say)
+            except OSError:
+                say (f'Anomaly: cannot read include file {e[1]}')
+        elif e[0] == 'D':
+            macros[e[1]] = e[2:]
+        elif e[0] == 'M':
+            mode, name, args = e[1:]
+            if name not in macros or not mode:
+                say (f'Anomaly: macro {name} is undefined, or used outside a section')
+                continue
+            params, body = macros[name]
+            if len(args) != len(params):
+                say (f'Anomaly: macro {name} has params {params} but got {args}')
+            secs[mode].append(Template(body).safe_substitute(dict(zip(params, args))))
+        else:
+            secs[e[0]].append(e[1])
+    active.pop()
+
+def loadScriptFile(fiName, say=print):
+    '''Read parameters, layout script, and cylinders script from file,
+    with includes and macros expanded'''
+    secs = {1: [], 2: [], 3: []}
+    expandScript(fiName, secs, {}, [], say)
+    pt, los, cs = (ScriptText(secs[k]) for k in (1, 2, 3))
+    return Design(los, cs, str(pt)) # Return Design, with params text
+
+colors, levels = 'GYRBCMW',  'abcde'
+thixx,  digits = 'pqrstuvw', '01234356789'
+colorSet = dict({'G':'Green', 'Y':'Yellow', 'R':'Red', 'B':'Blue', 'C':'Cyan', 'M':'Magenta', 'W':'White'})   
+designKeys = 'SF endGap postHi postDiam pDiam qDiam dRatio postLabel cylSegments'.split()
+scriptCache = {}                # path: (mtime, sha1, entries) of parsed scripts
+noValues = ('', '0', 'f', 'false', 'n', 'no') # Values that turn profile off
+paramSchema = ConfigSchema('pipeVue0', dict(
+    pDiam=0.06, qDiam=0.02, dRatio=sqrt(2), endGap=0.03, postHi=0.16,
+    postDiam=0.02, f='', SF=100, cylSegments=30, version=0,
+    postLabel='Bte',            # Blue, size u, level e
+    scadFile='pipeVue0.scad', # Name of scad output file
+    postList=False, cylList=False, # Control printing of post and cyl data
+    autoTol=-1e9, autoList=False,
+    autoScan=0,        # If > 0, report that many distance ranks; no output
+    adjFile='',        # Name of .json file for post positions & adjacency
+    designOut='',      # Name of .pvd file for resolved design
+    splitParts=False,  # Write per-part include files if true
+    splitSize=200,     # Objects per include file, if splitParts
+    splitBodies=False, # Write a file per colour, and one for posts, if true
+    clearance=-1.0,    # If >= 0, check tube-tube gaps (scaled by SF)
+    groupColors=False, # Put tubes in one block per colour & thickness if true
+    preview=False,     # Also write a low-detail preview file if true
+    previewSegments=6, # Sides of posts and tubes in preview
+    profile=''))       # t for profile summary, or name of .json file
+
+class PipeVueEngine:
+    '''State of one pipeVue render: its Config (see paramSchema), body
+    lists, edge sets, and stage profile.  Nothing is kept in module
+    globals, so engines for different designs can run at the same time
+    in threads or asyncio tasks.  Console output goes through say (eg
+    print, or a list's append method to capture it).'''
+    def __init__(self, cfg, say=print, prof=None):
+        self.cfg, self.say = cfg, say
+        self.prof = prof or StageProfile('pipeVue0') # Stage times and counts
+        self.bodies = {}        # colour name or 'posts': objects, for split bodies
+        self.edgeSet = set()    # (m, n) post pairs, m < n, of edges made
+        self.edgeRecs = []      # (m, n, attrs) of edges made, if designOut
+        self.tubeRecs = []      # (colour, at, angles, diam, h) of tubes, if preview
+        self.groups = {}        # (colour, thickness) letters: tubes, if groupColors
+        self.segRecs = []       # (m, n, p, q, radius) tube axes, if clearance >= 0
+        self.segLabels = []     # Labels of tubes in segRecs
+        self.nTubes = 0         # Number of tubes made
+
+    def addPart(self, assembly, label, obj, body):
+        '''Record obj in the list for its body (for split output) and
+        return assembly with obj added to it.'''
+        self.bodies.setdefault(body, []).append(obj)
+        if not assembly:
+            return obj
+        if assembly.name == 'union': # Add in place; union + obj would copy
+            return assembly.add(obj) # all of the union's children
+        return assembly + obj
+
+    def addTube(self, assembly, label, tube, attrs):
+        '''Add tube to assembly, or if groupColors is set, to the group
+        for its colour and thickness letters (first two of attrs)'''
+        self.nTubes += 1
+        if isTrue(self.cfg.groupColors):
+            self.groups.setdefault(attrs[:2], []).append(tube)
+            return assembly
+        return self.addPart(assembly, label, tube, colorSet[attrs[0]])
+
+    def addGroups(self, assembly):
+        '''Add a color(){ union(){...} } block per tube group to assembly,
+        print tube counts per group, and return assembly'''
+        from solid import color, union
+        for (colorr, thix), tubes in self.groups.items():
+            block = color(colorSet[colorr])(union()(tubes))
+            assembly = self.addPart(assembly, f'group {colorr}{thix}', block, colorSet[colorr])
+            self.say (f'Group {colorSet[colorr]:8} {thix}: {len(tubes)} tubes')
+        self.prof.count('groups', len(self.groups))
+        return assembly
+
+    def levelLet(self, lev):
+        deltaHi = self.cfg.SF*self.cfg.postHi/(len(levels)-1)
+        return (ord(lev)-ord(levels[0]))*deltaHi
+
+    def thickLet(self, thix):
+        cfg = self.cfg
+        if thix=='p':
+            return cfg.SF*cfg.pDiam
+        else: # diameters q, r, s, t... scale geometrically
+            expo = max(0, ord(thix)-ord('q'))
+            return cfg.SF * cfg.qDiam * pow(cfg.dRatio,expo)
+
+    def doLayout(self, dz):
+        LO = Layout(Point(0,0,0), [], [])
+        pc, code, numbers = '?', '?', []
+        codes, digits = 'BCGLPRT', '01234356789+-.'
+
+        for cc in dz.pLayout:       # Process current character
+            # Add character to number, or store a number?
+            if cc in digits:
+                num = num + cc if pc in digits else cc
+            elif pc in digits:
+                numbers.append(num) # Add number to list of numbers
+
+            # Process a completed entry, or start a new entry?
+            if cc==';':
+                LO = produceOut(code, numbers, LO, self.say)
+            elif cc in codes:
+                pc, code, numbers = '?', cc, []
+            pc = cc                 # Prep to get next character
+
+        # Now LO has an unscaled points list.  Create and return CSG
+        posts, SF = LO.posts, self.cfg.SF
+        for k in range(len(posts)):
+            p = posts[k]
+            p = Point(SF*p.x, SF*p.y, SF*p.z)
+            posts[k] = p
+            if isTrue(self.cfg.postList):
+                #print (f'Post {k:<3} ({p.x:8.2f}, {p.y:8.2f}, {p.z:8.2f} )')
+                self.say (f'p{k:<2}=Point( {p.x:8.2f}, {p.y:8.2f}, {p.z:8.2f})')
+        return self.makePosts(posts), LO
+
+    def makePosts(self, posts):
+        '''Return an assembly of posts and post labels at scaled points'''
+        from solid import color, cylinder, text, translate
+        cfg, assembly = self.cfg, None
+        postLabel = cfg.postLabel
+        for k, p in enumerate(posts):
+            tube = cylinder(d=cfg.SF*cfg.postDiam, h=cfg.SF*cfg.postHi)
+            cyli = translate([p.x, p.y, p.z])(tube)
+            assembly = self.addPart(assembly, f'post {k}', cyli, 'posts')
+            if isTrue(postLabel):
+                cName = colorSet['B']
+                thik  = self.thickLet('t')
+                zd    = self.levelLet('e')
+                for cc in postLabel:
+                    if cc in colors: cName = colorSet[cc]
+                    if cc in thixx:  thik  = self.thickLet(cc)
+                    if cc in levels: zd = self.levelLet(cc)
+                tx =  color(cName)(text(text=str(k),size=thik))
+                tr = translate([p.x-thik*(1+len(str(k))), p.y, zd+p.z])(tx)
+                assembly = self.addPart(assembly, f'label {k}', tr, cName)
+        return assembly
+
+    def makeCyl(self, posts, m, n, attrs, listIt):
+        '''Return a cylinder from post m to post n, its label, and its
+        length.  attrs has colour, thickness, and level letters, eg Gpae.'''
+        from solid import color, cylinder, rotate, translate
+        SF, endGap = self.cfg.SF, self.cfg.endGap
+        colorr, thix, level1, level2 = attrs
         p, q = posts[m], posts[n]
-        za1 = levelLet(level1)
-        za2 = levelLet(level2)
+        za1 = self.levelLet(level1)
+        za2 = self.levelLet(level2)
         pz, qz = za1 + p.z, za2 + q.z
         # p, q are scaled, so dx,dy,dz & L are too.
         dz, dx, dy = qz-pz, q.x-p.x,  q.y-p.y
@@ -225,143 +728,244 @@ def doCylinders(dz, LO, assembly):
         # Inputs are scaled, so cx, cy, cz are too.
         cx, cy, cz = p.x+alpha*dx, p.y+alpha*dy, pz+alpha*dz
         if isTrue(listIt):
-            print (f'Make  {cName:8} {thix} {m:2}{level1} {n:2}{level2}   Length {L:2.2f}')
+            self.say (f'Make  {cName:8} {thix} {m:2}{level1} {n:2}{level2}   Length {L:2.2f}')
         yAxisAngle = (pi/2 - asin(dz/L)) * 180/pi
         zAxisAngle =  atan2(dy, dx)      * 180/pi
-        diam = thickLet(thix)
+        diam = self.thickLet(thix)
         tube = cylinder(d=diam, h=L-SF*2*endGap)
-        colo = color(cName)(tube)
+        colo = tube if isTrue(self.cfg.groupColors) else color(cName)(tube)
         tilt = rotate([0,yAxisAngle,zAxisAngle])(colo)
+        if self.cfg.clearance >= 0:
+            h, u = L-SF*2*endGap, [dx/L, dy/L, dz/L]
+            self.segRecs.append((m, n, (cx,cy,cz), (cx+h*u[0], cy+h*u[1], cz+h*u[2]), diam/2))
+            self.segLabels.append(f'{cName} {thix} {m}{level1} {n}{level2}')
+        if isTrue(self.cfg.preview):
+            self.tubeRecs.append((cName, [cx,cy,cz], [0,yAxisAngle,zAxisAngle], diam, L-SF*2*endGap))
         # Return a ready-to-use cylinder
-        return translate([cx,cy,cz])(tilt), m, n, L
+        return translate([cx,cy,cz])(tilt), f'tube {m}{level1} {n}{level2}', L
 
-    def addEdge(v,w):
-        if v in edgeList:
-            if w not in edgeList[v]:
-                edgeList[v].append(w)
-        else:
-            edgeList[v] = [w]
-           
+    def doCylinders(self, dz, LO, assembly):
+        def oneCyl(listIt):   # Add a cylinder; return its end-post #'s & length
+            nonlocal assembly
+            m, n = int(post1)%nPosts, int(post2)%nPosts
+            attrs = colorr + thix + level1 + level2
+            if cfg.designOut:
+                self.edgeRecs.append((m, n, attrs))
+            cyli, label, L = self.makeCyl(posts, m, n, attrs, listIt)
+            assembly = self.addTube(assembly, label, cyli, attrs)
+            return m, n, L
 
-    specs, posts = dz.cSpec, LO.posts
-    colorr='G'; thix='p'; pc = None
-    post1, post2, level1, level2 = '0', '1', 'c','c'
-    nPosts = len(posts)
-    nonPost = True
-    edgeList, Lmax = {}, 0
-    for cc in specs:
-        if cc in colors: colorr = cc
-        elif cc in thixx: thix  = cc
-        elif cc in levels:
-            level1, level2 = level2, cc
-        elif cc in digits:
-            if pc in digits:  post2 = post2 + cc
-            else:             post1, post2 = post2, cc
-            nonPost = False
-        elif cc=='/':
-            level1, level2 = level2, level1
-        elif cc==';':
-            if nonPost:
-                post1, post2 = str(1+int(post1)), str(1+int(post2))
-            cyli, p1, p2, L = oneCyl(cylList)
-            assembly = assembly + cyli if assembly else cyli
+        cfg, edgeSet, say = self.cfg, self.edgeSet, self.say
+        specs, posts = dz.cSpec, LO.posts
+        colorr='G'; thix='p'; pc = ' '
+        post1, post2, level1, level2 = '0', '1', 'c','c'
+        nPosts = len(posts)
+        nonPost = True
+        ends, skipped, Lmax = set(), 0, 0 # ends: canonical (post,level) pairs
+        for cc in specs:
+            if cc in colors: colorr = cc
+            elif cc in thixx: thix  = cc
+            elif cc in levels:
+                level1, level2 = level2, cc
+            elif cc in digits:
+                if pc in digits:  post2 = post2 + cc
+                else:             post1, post2 = post2, cc
+                nonPost = False
+            elif cc=='/':
+                level1, level2 = level2, level1
+            elif cc==';':
+                if nonPost:
+                    post1, post2 = str(1+int(post1)), str(1+int(post2))
+                e1, e2 = (int(post1)%nPosts, level1), (int(post2)%nPosts, level2)
+                if (min(e1,e2), max(e1,e2)) in ends:
+                    skipped += 1    # Skip duplicate of an earlier edge
+                else:
+                    ends.add((min(e1,e2), max(e1,e2)))
+                    p1, p2, L = oneCyl(cfg.cylList)
+                    Lmax = max(L, Lmax)
+                    edgeSet.add((min(p1,p2), max(p1,p2)))
+                nonPost = True
+            pc = cc
+        # Add edges that layout codes (eg G) made, if not already present
+        for m, n in LO.edges:
+            if (min(m,n), max(m,n)) not in edgeSet:
+                post1, post2 = str(m), str(n)
+                p1, p2, L = oneCyl(cfg.cylList)
+                Lmax = max(L, Lmax)
+                edgeSet.add((min(p1,p2), max(p1,p2)))
+        # Finished with specs; now see if we need to auto-add cylinders
+        if skipped:
+            say (f'Skipped {skipped} duplicate edges')
+        self.prof.count('dupEdges', skipped)
+        nCyl = self.nTubes
+        with self.prof.stage('cylinders.auto'):
+            if cfg.autoScan > 0:    # Report distance ranks instead of auto-adding
+                reportRanks(posts, cfg.autoScan, Lmax, say)
+                return assembly
+            cutoff = Lmax + cfg.autoTol
+            if cutoff > 0:   # See if no way for any more edges
+                say (f'In auto-add, cutoff distance is {cutoff:7.2f} = Lmax + autoTol = {Lmax:0.2f} + {cfg.autoTol}')
+                say (f'{len(edgeSet)} edges specified')
+                for pn, qn, d2 in nearPairs(posts, cutoff):
+                    if (pn, qn) not in edgeSet:
+                        post1, post2 = str(pn), str(qn)
+                        oneCyl(cfg.autoList)
+                        edgeSet.add((pn, qn))
+        self.prof.count('autoEdges', self.nTubes - nCyl)
+        return assembly
+
+    def resolvedLayout(self, rd):
+        '''Return assembly of posts, and layout, of a resolved design rd
+        (see pipeDesign.py), scaling its posts if SF has changed'''
+        SF = self.cfg.SF
+        scale = SF/rd.params.get('SF', SF)
+        posts = [Point(scale*x, scale*y, scale*z) for x, y, z in rd.posts.tolist()]
+        for k, p in enumerate(posts):
+            if isTrue(self.cfg.postList):
+                self.say (f'p{k:<2}=Point( {p.x:8.2f}, {p.y:8.2f}, {p.z:8.2f})')
+        return self.makePosts(posts), Layout(Point(0,0,0), posts, [])
+
+    def resolvedCylinders(self, rd, LO, assembly):
+        '''Add cylinders of resolved design rd to assembly and return it.
+        Edges are used as is: no duplicate checks or auto-adds.'''
+        cfg = self.cfg
+        posts, attrText, Lmax = LO.posts, rd.attrs.tobytes().decode('ascii'), 0
+        for k, (m, n) in enumerate(rd.edges.tolist()):
+            attrs = attrText[4*k:4*k+4]
+            if cfg.designOut:
+                self.edgeRecs.append((m, n, attrs))
+            cyli, label, L = self.makeCyl(posts, m, n, attrs, cfg.cylList)
+            assembly = self.addTube(assembly, label, cyli, attrs)
             Lmax = max(L, Lmax)
-            addEdge(p1, p2)  # Add edge to edges list
-            addEdge(p2, p1)
-            nonPost = True
-        pc = cc
-    # Finished with specs; now see if we need to auto-add cylinders
-    cutoff = Lmax + autoTol
-    if cutoff > 0:   # See if no way for any more edges
-        print (f'In auto-add, cutoff distance is {cutoff:7.2f} = Lmax + autoTol = {Lmax:0.2f} + {autoTol}')
-        cutoff2 = cutoff*cutoff
-        print (edgeList)
-        for pn in range(nPosts):
-            p = posts[pn]
-            for qn in range(1+pn, nPosts):
-                q = posts[qn]
-                dx, dy = p.x-q.x, p.y-q.y
-                #print (f'pn {pn}  qn {qn}   cutoff {cutoff:7.2f}  dx {dx:7.2f}  dy {dy:7.2f} ')
-                if abs(dx) > cutoff or abs(dy) > cutoff:
-                    continue
-                d2 = ssq(dx, dy, p.z-q.z)
-                #print (f'cutoff2 {cutoff2:7.2f}  d2 {d2:7.2f} ')
-                if d2 > cutoff2: continue
-                if pn not in edgeList or qn not in edgeList[pn]:
-                    post1, post2 = str(pn), str(qn)
-                    cyli, p1, p2, L = oneCyl(autoList)
-                    assembly = assembly + cyli if assembly else cyli
-    return assembly
-
-def installParams(parTxt):
-    '''Given a string like "var1=val1 var2=val2 var3=val3 ...", extract
-    the variable names and the values, convert the values to numeric
-    forms, and store the values in the globals() dict.  Note, do not
-    use any white space within any of the var=val strings.    '''
-    plist = parTxt.split()      # Split the list on white space
-    flubs, glob = '', globals()
-    for vev in plist:
-        p = pq = vev.split('=')          # Split each equation on = sign
-        q, ok = '', False
-        if len(pq)==2:
-            p, q = pq
-            if p in glob.keys():
-                t, v = type(glob[p]), q
-                try:
-                    if   t==int:   v = int(q);     ok=True
-                    elif t==float: v = float(q);   ok=True
-                    elif t==bool:  v = isTrue(q);  ok=True
-                    elif t==str:   v = q;          ok=True
-                except:  pass
-        if ok:
-            glob[p] = v
-        else:  flubs += f' [ {p} {q} ] '
-    if flubs: print (f'Parameter-setting fail: {flubs}')
+            self.edgeSet.add((min(m,n), max(m,n)))
+        if cfg.autoScan > 0:
+            reportRanks(posts, cfg.autoScan, Lmax, self.say)
+        return assembly
 
-def loadScriptFile(fiName):
-    '''Read parameters, layout script, and cylinders script from file'''
-    mode = 0;                   # Start out in comments mode
-    pt = los = cs = ''          # Start with empty scripts
-    with open(fiName) as fi:
-        for line in fi:
-            ll, l1, l2 = len(line), line[:1], line[:2]
-            if l1 == '=':   # Detect section change vs comment ...
-                if   l2=='=P': mode = 1 # Parameters
-                elif l2=='=L': mode = 2 # Layout
-                elif l2=='=C': mode = 3 # Cylinders
+    def build(self, dz):
+        '''Return (assembly, layout) for design dz: a Design from
+        loadDesign or loadScriptFile, or a Resolved one from readDesign'''
+        resolved = isinstance(dz, Resolved)
+        with self.prof.stage('layout'):
+            assembly, LO = self.resolvedLayout(dz) if resolved else self.doLayout(dz)
+        with self.prof.stage('cylinders'):
+            if resolved:
+                assembly = self.resolvedCylinders(dz, LO, assembly)
             else:
-                if   mode==1: pt  = pt  + line
-                elif mode==2: los = los + line
-                elif mode==3: cs  = cs  + line
-    installParams(pt)           # Install params, if any
-    return Design(los, cs)      # Return Design
+                assembly = self.doCylinders(dz, LO, assembly)
+            assembly = self.addGroups(assembly)
+        if self.cfg.clearance >= 0:
+            with self.prof.stage('check'):
+                self.checkTubes()
+        return assembly, LO
 
-colors, levels = 'GYRBCMW',  'abcde'
-thixx,  digits = 'pqrstuvw', '01234356789'
-colorSet = dict({'G':'Green', 'Y':'Yellow', 'R':'Red', 'B':'Blue', 'C':'Cyan', 'M':'Magenta', 'W':'White'})   
+    def checkTubes(self):
+        '''Print tube-tube intersections and near misses (gaps less
+        than SF*clearance) and return their number'''
+        clear = self.cfg.SF*self.cfg.clearance
+        clashes = tubeClashes(self.segRecs, clear)
+        for gap, i, j in clashes:
+            kind = 'Intersect' if gap < 0 else 'Near miss'
+            self.say (f'{kind}  {self.segLabels[i]:18} with {self.segLabels[j]:18}  gap {gap:7.2f}')
+        nHit = sum(1 for gap, i, j in clashes if gap < 0)
+        self.say (f'Tube check: {nHit} intersections, {len(clashes)-nHit} near misses '
+                  f'(gap < {clear:0.2f}) among {len(self.segRecs)} tubes')
+        self.prof.count('clashes', len(clashes))
+        return len(clashes)
 
-if __name__ == '__main__':
-    # Set initial values of main parameters
-    pDiam,   qDiam,    dRatio   = 0.06, 0.02, sqrt(2)
-    endGap,  postHi,   postDiam = 0.03, 0.16, qDiam
-    f,       SF,    cylSegments = '', 100, 30
-    version, paramTxt, postLabel= 0, '','Bte' # Blue, size u, level e
-    scadFile = f'pipeVue{version}.scad' # Name of scad output file
-    postList = cylList = False # Control printing of post and cyl data
-    autoTol, autoList = -1e9, False
-    for k in range(1,len(argv)):
-        paramTxt = paramTxt + ' ' + argv[k]
-    installParams(paramTxt)     # Set params from command line
-    
+    def previewAssembly(self, posts):
+        '''Return a low-detail assembly of posts and recorded tubes, with
+        no labels, and one union of tubes per colour'''
+        from solid import color, cylinder, rotate, translate, union
+        cfg, groups = self.cfg, {}
+        post = cylinder(d=cfg.SF*cfg.postDiam, h=cfg.SF*cfg.postHi)
+        asm = union()([translate([p.x, p.y, p.z])(post) for p in posts])
+        for cName, at, angles, diam, h in self.tubeRecs:
+            groups.setdefault(cName, []).append(translate(at)(rotate(angles)(cylinder(d=diam, h=h))))
+        for cName, tubes in groups.items():
+            asm.add(color(cName)(union()(tubes)))
+        return asm
+
+    def previewText(self, posts):
+        '''Return OpenSCAD code for the preview assembly'''
+        from solid import scad_render
+        return scad_render(self.previewAssembly(posts),
+                           file_header=f'$fn = {self.cfg.previewSegments};')
+
+    def scadText(self, assembly):
+        '''Return OpenSCAD code for assembly'''
+        from solid import scad_render
+        return scad_render(assembly, file_header=f'$fn = {self.cfg.cylSegments};')
+
+def loadDesign(f, say=print):
+    '''Return design for file name f: the built-in design if f is empty,
+    a Resolved design if f is a .pvd file, else a script-file Design'''
     if f == '':
-        dz = Design('C 0,0,0; P5,1,0;', 'Gpae 1,2;;;;1;')
+        return Design('C 0,0,0; P5,1,0;', 'Gpae 1,2;;;;1;')
+    if f.endswith('.pvd'):
+        return readDesign(f)
+    return loadScriptFile(f, say)
+
+def designConfig(dz, *layers):
+    '''Return (Config, flubs) for design dz: paramSchema defaults, then
+    the design's params, then each of layers (eg environment and
+    command-line params)'''
+    if isinstance(dz, Resolved):
+        fileParams = {k: v for k, v in dz.params.items() if k in designKeys}
     else:
-        dz = loadScriptFile(f)  # May install params from file.
-    installParams(paramTxt)     # Again, set params from command line.
-
-    assembly, LO = doLayout(dz)
-    assembly = doCylinders(dz, LO, assembly)
-    scad_render_to_file(assembly, scadFile,
-                        file_header = f'$fn = {cylSegments};',
-                        include_orig_code=False)
-    print (f'Wrote scad code to {scadFile}')
+        fileParams = dz.params
+    return paramSchema.resolve(fileParams, *layers)
+
+def renderScad(cfg, dz, say=print):
+    '''Return OpenSCAD code for design dz made with Config cfg'''
+    eng = PipeVueEngine(cfg, say)
+    return eng.scadText(eng.build(dz)[0])
+
+if __name__ == '__main__':
+    startup = startupFlag(argv) # Remove --startup-profile arg
+    prof = StageProfile('pipeVue0') # Stage times and counts
+    with prof.stage('import'):
+        import solid            # (Else its import time lands in layout)
+    f = paramSchema.resolve(argv[1:])[0].f # Get file name from command line
+    with prof.stage('load'):
+        dz = loadDesign(f)      # With params from =P section or .pvd file
+    cfg, flubs = designConfig(dz, paramSchema.environ(), argv[1:])
+    if flubs: print (f'Parameter-setting fail: {flubs}')
+    eng = PipeVueEngine(cfg, print, prof)
+    assembly, LO = eng.build(dz)
+    scadFile, edgeSet = cfg.scadFile, eng.edgeSet
+    with prof.stage('render'):
+        if cfg.autoScan > 0:
+            pass                # Analysis mode makes no scad output
+        elif isTrue(cfg.splitParts):
+            parts = [(body, obj) for body, objs in eng.bodies.items() for obj in objs]
+            nNew, nOld, nGone = writeSplitScad(parts, scadFile, f'$fn = {cfg.cylSegments};', cfg.splitSize)
+            print (f'Wrote {nNew} new parts ({nOld} unchanged, {nGone} removed) for {scadFile}')
+        elif isTrue(cfg.splitBodies):
+            for fiName, n, wrote in writeBodies(eng.bodies, scadFile, f'$fn = {cfg.cylSegments};'):
+                print (f'{"Wrote" if wrote else "Kept "} {n:4} objects in {fiName}')
+        else:
+            with open(scadFile, 'w') as fo:
+                fo.write(eng.scadText(assembly))
+            print (f'Wrote scad code to {scadFile}')
+        if isTrue(cfg.preview) and cfg.autoScan <= 0:
+            previewFile = scadFile[:-5] + '-preview.scad' if scadFile.endswith('.scad') else scadFile + '-preview'
+            with open(previewFile, 'w') as fo:
+                fo.write(eng.previewText(LO.posts))
+            print (f'Wrote preview code to {previewFile}')
+    if cfg.adjFile:
+        indptr, indices = adjacencyCSR(edgeSet, len(LO.posts))
+        with open(cfg.adjFile, 'w') as fo:
+            json.dump({'posts': [list(p) for p in LO.posts],
+                       'indptr': indptr, 'indices': indices}, fo)
+        print (f'Wrote {len(LO.posts)} posts and {len(edgeSet)} edges to {cfg.adjFile}')
+    if cfg.designOut and cfg.autoScan <= 0:
+        writeDesign(cfg.designOut, cfg.asDict(designKeys), LO.posts, eng.edgeRecs)
+        print (f'Wrote {len(LO.posts)} posts and {len(eng.edgeRecs)} edges to {cfg.designOut}')
+    if cfg.profile.endswith('.json') or cfg.profile.lower() not in noValues:
+        prof.count('posts', len(LO.posts))
+        prof.count('edges', eng.nTubes)
+        prof.count('nodes', countNodes(assembly))
+        prof.report(cfg.profile if cfg.profile.endswith('.json') else '')
+    if startup:
+        startup.report()
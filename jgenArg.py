@@ -25,13 +25,13 @@ if __name__ == '__main__':
     '''Demo use of genArg to get and convert 3 args.'''
     from sys import argv
     def say(v, tv, nv):
-        typ = 'i' if isinstance(v, int) else ('f' if isinstance(v, float) else ('s' if isinstance(v, basestring) else '?'))
-        print '{} is `{}` vs default `{}`  Type: {}'.format(tv, v, defVals[nv], typ)
+        typ = 'i' if isinstance(v, int) else ('f' if isinstance(v, float) else ('s' if isinstance(v, str) else '?'))
+        print ('{} is `{}` vs default `{}`  Type: {}'.format(tv, v, defVals[nv], typ))
     
     defVals = [13, 17.7, 'nemo']
-    print 'sys.argv = {}'.format(argv)
-    print 'defVals  = {}'.format(defVals)
+    print ('sys.argv = {}'.format(argv))
+    print ('defVals  = {}'.format(defVals))
     vargs = genArg(defVals)
-    ii = vargs.next();  say(ii, 'ii', 0)
-    ff = vargs.next();  say(ff, 'ff', 1)
-    ss = vargs.next();  say(ss, 'ss', 2)
+    ii = next(vargs);  say(ii, 'ii', 0)
+    ff = next(vargs);  say(ff, 'ff', 1)
+    ss = next(vargs);  say(ss, 'ss', 2)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+'''Module to write and read a compact binary form of a fully resolved
+pipeVue design: post positions, edges with their colour, thickness
+and level letters, and the parameter values they were made with.
+Reading maps the file and returns memoryviews into it, so loading
+copies no post or edge data.'''
+
+# File layout (all numbers little-endian):
+#   0   8 bytes      magic, b'PVDESIGN'
+#   8   4 x uint32   format version (1), nPosts, nEdges, nParamBytes
+#   24  nParamBytes  params as utf-8 JSON, zero-padded to a multiple of 8
+#   ..  nPosts x 3 float64   post x, y, z (scaled, as rendered)
+#   ..  nEdges x 2 uint32    edge post numbers m, n
+#   ..  nEdges x 4 uint8     edge colour, thickness, level1, level2
+#                            letters (eg b'Gpae'), as in cylinder scripts
+#
+# The posts section starts at a multiple of 8 and the edges section
+# at a multiple of 4, so other tools can view them in place, eg:
+#     d = readDesign('dome.pvd')
+#     posts = numpy.frombuffer(d.posts, '<f8').reshape(-1, 3)
+#     edges = numpy.frombuffer(d.edges, '<u4').reshape(-1, 2)
+# or get offsets from designSections() and use numpy.memmap.
+
+import json, sys
+from array import array
+from collections import namedtuple
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+
+magic, version = b'PVDESIGN', 1
+header = Struct('<8s4I')
+Resolved = namedtuple('Resolved', 'params, posts, edges, attrs')
+
+def designSections(nPosts, nEdges, nParamBytes):
+    '''Return byte offsets of params, posts, edges, and attrs sections,
+    and total file size'''
+    oParams = header.size
+    oPosts = oParams + (nParamBytes + 7)//8*8
+    oEdges = oPosts + 24*nPosts
+    oAttrs = oEdges + 8*nEdges
+    return oParams, oPosts, oEdges, oAttrs, oAttrs + 4*nEdges
+
+def shaped(view, fmt, n, k):
+    '''Return bytes view cast to format fmt, with shape (n,k) if n > 0
+    (memoryviews can't have a zero in their shape)'''
+    return view.cast(fmt, (n, k)) if n else view.cast(fmt)
+
+def writeDesign(fiName, params, posts, edges):
+    '''Write a resolved design to file fiName.  params is a dict of
+    JSON-able values; posts is a list of (x,y,z) triples; edges is a
+    list of (m, n, attrs) where attrs is a 4-letter string like 'Gpae'.'''
+    pb = json.dumps(params, sort_keys=True).encode()
+    oParams, oPosts, oEdges, oAttrs, size = designSections(len(posts), len(edges), len(pb))
+    pa = array('d', [c for p in posts for c in p])
+    ea = array('I', [k for e in edges for k in e[:2]])
+    if sys.byteorder == 'big':
+        pa.byteswap(); ea.byteswap()
+    with open(fiName, 'wb') as fo:
+        fo.write(header.pack(magic, version, len(posts), len(edges), len(pb)))
+        fo.write(pb.ljust(oPosts - oParams, b'\0'))
+        fo.write(pa.tobytes())
+        fo.write(ea.tobytes())
+        fo.write(''.join(e[2] for e in edges).encode('ascii'))
+
+def readDesign(fiName):
+    '''Map file fiName and return a Resolved tuple: params dict; posts
+    as a float64 memoryview of shape (nPosts,3); edges as a uint32
+    memoryview of shape (nEdges,2); attrs as a bytes-like memoryview of
+    shape (nEdges,4).  Raises ValueError if file is not a design file.'''
+    with open(fiName, 'rb') as fi:
+        data = mmap(fi.fileno(), 0, access=ACCESS_READ)
+    if len(data) < header.size:
+        raise ValueError(f'{fiName} is too short for a design file')
+    mag, ver, nPosts, nEdges, nPB = header.unpack_from(data)
+    if mag != magic or ver != version:
+        raise ValueError(f'{fiName} is not a version {version} design file')
+    oParams, oPosts, oEdges, oAttrs, size = designSections(nPosts, nEdges, nPB)
+    if len(data) < size:
+        raise ValueError(f'{fiName} is truncated: {len(data)} bytes, expected {size}')
+    view = memoryview(data)
+    params = json.loads(bytes(view[oParams:oParams+nPB]))
+    posts, edges = view[oPosts:oEdges], view[oEdges:oAttrs]
+    if sys.byteorder == 'big':  # Copy & swap, as views are native-order
+        pa, ea = array('d'), array('I')
+        pa.frombytes(posts); ea.frombytes(edges)
+        pa.byteswap(); ea.byteswap()
+        posts, edges = memoryview(pa).cast('B'), memoryview(ea).cast('B')
+    return Resolved(params, shaped(posts, 'd', nPosts, 3), shaped(edges, 'I', nEdges, 2),
+                    shaped(view[oAttrs:size], 'B', nEdges, 4))
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+'''Local HTTP render service.  Accepts pipeVue scripts and smd-channels
+.xml specs, and returns .scad code (or .stl, via openscad) made by a
+pool of worker processes that keep SolidPython and the generator
+modules loaded between requests.'''
+
+# Params are keyword=value forms, in any order (see runConfig.py; they
+# can also come from RENDERSERVICE_<name> environment variables):
+#   host=127.0.0.1  port=8765   Address to serve on
+#   workers=0       Number of worker processes; 0 means one per CPU
+#   queue=32        Requests that may wait for a worker; more get 503
+#   timeout=60      Seconds a request waits for its render; then 504
+#   jobTimeout=120  Seconds a render may run in its worker; then it is
+#                   stopped, and the request gets 504
+#   cache=256       Number of responses kept, keyed by input hash
+#   maxBody=16000000  Largest request body accepted, in bytes
+#
+# Requests:
+#   POST /pipevue?SF=50&...   Body is a pipeVue script (=P, =L, =C
+#       sections; scripts with =I includes are refused with 422, so
+#       clients can't read files on the server).  Query params are
+#       pipeVue params, overriding the script's =P params.
+#   POST /channels?rail=k     Body is an smd-channels .xml specs file
+#       (with the same table schema as ChannelVars.py).  rail selects
+#       the Unit Specs row to use; default is the row marked in Use.
+#   GET /status               JSON counts of queue, cache, and results
+# Add format=stl to a POST query to get STL instead of SCAD; that
+# needs openscad on the PATH, else the reply is 501.  Replies carry
+# the generator's console output in an X-Render-Log header.
+#
+# Identical requests (same kind, params, and body) are answered from
+# the cache, or share the render already in progress.  A request that
+# times out gets a 504, but its render keeps going in its worker, up
+# to jobTimeout, and is cached, so a retry can get it.  A worker
+# enforces jobTimeout itself, via SIGALRM.  If a worker still hasn't
+# finished a few seconds after that (eg, stuck in C code), the pool's
+# processes are killed and a new pool started; requests whose renders
+# were in the old pool get 503.  (SIGALRM needs a Unix-like system.)
+
+# Example:
+#     ./renderService.py port=8765 &
+#     curl --data-binary @hexbars/eg-two-rings 'localhost:8765/pipevue?SF=50'
+
+import asyncio, importlib, json, os, shutil, signal, subprocess, sys, tempfile
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout
+from hashlib import sha1
+from io import StringIO
+from urllib.parse import parse_qsl, urlsplit
+thisDir = os.path.dirname(os.path.abspath(__file__))
+for d in ('', 'hexbars', 'smd-channels'):
+    sys.path.append(os.path.join(thisDir, d))
+from runConfig import ConfigSchema
+
+schema = ConfigSchema('renderService', dict(host='127.0.0.1', port=8765, workers=0,
+                      queue=32, timeout=60.0, jobTimeout=120.0, cache=256, maxBody=16000000))
+stuckGrace = 5                  # Seconds past jobTimeout before a worker counts as stuck
+kinds = ('pipevue', 'channels')
+reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error',
+           501: 'Not Implemented', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+class RenderError(Exception):
+    '''Failure of a request, with the HTTP status to reply with'''
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+    def __reduce__(self):       # (So it pickles back from workers)
+        return (RenderError, (self.status, str(self)))
+
+#---------------------------------------------
+# Worker-process side
+def warmWorker():
+    '''Pool initializer: import SolidPython and the generators once'''
+    importlib.import_module('solid')
+    importlib.import_module('pipeVue0')
+    importlib.import_module('smd-channelsProduce')
+
+def pipeVueScad(script, params, work, log):
+    '''Return SCAD code for pipeVue script bytes, with params dict
+    overriding its =P params'''
+    pv = importlib.import_module('pipeVue0')
+    fi = os.path.join(work, 'design')
+    with open(fi, 'wb') as fo:
+        fo.write(script)
+    try:
+        if any(e[0] == 'I' for e in pv.parseScript(fi)):
+            raise RenderError(422, 'Scripts with =I includes are not accepted here')
+        dz = pv.loadDesign(fi, log.append)
+        cfg, flubs = pv.designConfig(dz, params)
+        if flubs:
+            log.append(f'Parameter-setting fail: {flubs}')
+        return pv.renderScad(cfg, dz, log.append)
+    finally:
+        pv.scriptCache.pop(os.path.abspath(fi), None)
+
+def channelsScad(specs, params, work, log):
+    '''Return SCAD code for the rail of smd-channels .xml specs bytes,
+    as smd-channelsProduce's Produce would make it'''
+    prod = importlib.import_module('smd-channelsProduce')
+    from headlessTables import loadHeadless
+    from stageProfile import StageProfile
+    fi, asmFile = os.path.join(work, 'specs.xml'), os.path.join(work, 'channels.scad')
+    with open(fi, 'wb') as fo:
+        fo.write(specs)
+    mains = loadHeadless(fi)
+    if 'rail' in params:
+        mains.tab2.radioRo = int(params['rail'])
+    out = StringIO()
+    with redirect_stdout(out):
+        rail, tapes = prod.RailData(mains, 0.02), prod.getTapeDataList(mains)
+        prod.writeAssembly(rail, tapes, asmFile, False, StageProfile('renderService'))
+    log.append(out.getvalue().rstrip('\n'))
+    with open(asmFile) as fi:
+        return fi.read()
+
+def scadToSTL(scad, work, timeout):
+    '''Return STL bytes that openscad makes from SCAD code scad'''
+    exe = shutil.which('openscad')
+    if not exe:
+        raise RenderError(501, 'STL output needs openscad, which is not on the PATH')
+    scadFi, stlFi = os.path.join(work, 'out.scad'), os.path.join(work, 'out.stl')
+    with open(scadFi, 'w') as fo:
+        fo.write(scad)
+    try:
+        done = subprocess.run([exe, '-o', stlFi, scadFi], stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise RenderError(504, f'openscad took over {timeout} s') from None
+    if done.returncode:
+        raise RenderError(422, 'openscad failed: ' + done.stdout.decode(errors='replace')[-2000:])
+    with open(stlFi, 'rb') as fi:
+        return fi.read()
+
+def jobAlarm(signum, frame):
+    raise RenderError(504, 'Render stopped at its time limit')
+
+def renderJob(kind, params, body, timeout):
+    '''Worker: return (reply bytes, content type, console log) for a
+    render request, stopping it after timeout seconds.  Raises
+    RenderError for bad input or time out.'''
+    signal.signal(signal.SIGALRM, jobAlarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return renderWork(kind, params, body, timeout)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def renderWork(kind, params, body, timeout):
+    '''Return (reply bytes, content type, console log) for a render
+    request'''
+    log, fmt = [], params.pop('format', 'scad')
+    with tempfile.TemporaryDirectory(prefix='renderService-') as work:
+        try:
+            make = pipeVueScad if kind == 'pipevue' else channelsScad
+            scad = make(body, params, work, log)
+        except RenderError:
+            raise
+        except Exception as e:  # Bad script or specs
+            raise RenderError(422, f'{type(e).__name__}: {e}') from None
+        if fmt == 'stl':
+            return scadToSTL(scad, work, timeout), 'model/stl', '\n'.join(log)
+    return scad.encode(), 'text/plain; charset=utf-8', '\n'.join(log)
+
+#---------------------------------------------
+# Service side
+class RenderService:
+    '''Bounded queue of render requests, served by a pool of worker
+    processes, with an LRU cache of replies keyed by input hash'''
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.nWorkers = cfg.workers or os.cpu_count() or 1
+        self.pool = self.newPool()
+        self.queue = asyncio.Queue(cfg.queue)
+        self.cache = OrderedDict()  # key: (data, ctype, log)
+        self.pending = {}           # key: future, of renders queued or running
+        self.stats = Counter()
+        self.tasks = [asyncio.ensure_future(self.dispatch()) for k in range(self.nWorkers)]
+
+    def newPool(self):
+        return ProcessPoolExecutor(self.nWorkers, initializer=warmWorker)
+
+    def replacePool(self):
+        '''Kill the pool's worker processes (one is stuck past its time
+        limit) and start a new pool'''
+        old, self.pool = self.pool, self.newPool()
+        self.stats['poolRestarts'] += 1
+        for p in list((old._processes or {}).values()): # (No public way to kill workers)
+            p.kill()
+        old.shutdown(wait=False, cancel_futures=True)
+
+    def requestKey(self, kind, params, body):
+        '''Return hex sha1 of a request's kind, params, and body'''
+        h = sha1(json.dumps([kind, sorted(params.items())]).encode())
+        h.update(body)
+        return h.hexdigest()
+
+    async def render(self, kind, params, body):
+        '''Return (data, ctype, log) for a request, from the cache, a
+        render in progress, or a new render'''
+        key = self.requestKey(kind, params, body)
+        if key in self.cache:
+            self.stats['hits'] += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        fut = self.pending.get(key)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            try:
+                self.queue.put_nowait((key, kind, params, body, fut))
+            except asyncio.QueueFull:
+                self.stats['busy'] += 1
+                raise RenderError(503, f'Render queue is full ({self.cfg.queue} waiting)')
+            self.pending[key] = fut
+            self.stats['renders'] += 1
+        else:
+            self.stats['shared'] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), self.cfg.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise RenderError(504, f'Render took over {self.cfg.timeout} s; retry later for the cached result')
+
+    async def dispatch(self):
+        '''Hand queued requests to the worker pool, one at a time'''
+        loop = asyncio.get_running_loop()
+        while True:
+            key, kind, params, body, fut = await self.queue.get()
+            jobTimeout = self.cfg.jobTimeout
+            try:
+                job = loop.run_in_executor(self.pool, renderJob, kind, dict(params), body, jobTimeout)
+                try:
+                    result = await asyncio.wait_for(job, jobTimeout + stuckGrace)
+                except asyncio.TimeoutError:
+                    self.replacePool()
+                    raise RenderError(504, f'Render ran over {jobTimeout} s and its worker was stopped') from None
+                except BrokenProcessPool:
+                    raise RenderError(503, 'Worker pool was restarted during this render; retry') from None
+                self.cache[key] = result
+                while len(self.cache) > self.cfg.cache:
+                    self.cache.popitem(last=False)
+                fut.set_result(result)
+            except Exception as e:
+                self.stats['errors'] += 1
+                fut.set_exception(e)
+                fut.exception()     # (Mark as retrieved, if every waiter timed out)
+            finally:
+                del self.pending[key]
+                self.queue.task_done()
+
+    def status(self):
+        '''Return dict of queue, cache, and result counts'''
+        return dict(self.stats, workers=self.nWorkers, queued=self.queue.qsize(),
+                    inProgress=len(self.pending), cached=len(self.cache))
+
+    async def reply(self, method, target, body):
+        '''Return (status, data, ctype, log) for an HTTP request'''
+        url = urlsplit(target)
+        kind = url.path.strip('/')
+        if kind == 'status':
+            return 200, json.dumps(self.status()).encode(), 'application/json', ''
+        if kind not in kinds:
+            return 404, f'Unknown path {url.path}; use /pipevue, /channels, or /status\n'.encode(), 'text/plain', ''
+        if method != 'POST':
+            return 405, b'Use POST, with the script or specs as the body\n', 'text/plain', ''
+        try:
+            data, ctype, log = await self.render(kind, dict(parse_qsl(url.query)), body)
+        except RenderError as e:
+            return e.status, (str(e) + '\n').encode(), 'text/plain', ''
+        return 200, data, ctype, log
+
+    async def handle(self, reader, writer):
+        '''Serve one HTTP/1.1 request on a connection, then close it'''
+        try:
+            method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                k, _, v = line.decode('latin-1').partition(':')
+                headers[k.strip().lower()] = v.strip()
+            size = int(headers.get('content-length', 0))
+            if size > self.cfg.maxBody:
+                status, data, ctype, log = 413, b'Body too large\n', 'text/plain', ''
+            else:
+                body = await reader.readexactly(size)
+                status, data, ctype, log = await self.reply(method, target, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, data, ctype, log = 400, b'Bad request\n', 'text/plain', ''
+        except Exception as e:
+            status, data, ctype, log = 500, f'{type(e).__name__}: {e}\n'.encode(), 'text/plain', ''
+        head = [f'HTTP/1.1 {status} {reasons[status]}', f'Content-Type: {ctype}',
+                f'Content-Length: {len(data)}', 'Connection: close']
+        if log:
+            head.append('X-Render-Log: ' + ' | '.join(log.split('\n'))[:4000].encode('ascii', 'replace').decode())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def close(self):
+        for t in self.tasks:
+            t.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+async def serve(cfg):
+    service = RenderService(cfg)
+    server = await asyncio.start_server(service.handle, cfg.host, cfg.port)
+    print (f'Serving renders on http://{cfg.host}:{cfg.port}/ with {service.nWorkers} workers')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+if __name__ == '__main__':
+    cfg, flubs = schema.resolve(schema.environ(), sys.argv[1:])
+    if flubs:
+        sys.exit(f'Parameter-setting fail: {flubs}')
+    try:
+        asyncio.run(serve(cfg))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+'''Module for typed, layered, immutable run parameters.  A ConfigSchema
+declares each parameter's name, default value, and type; its resolve
+method layers defaults, script-file params, environment variables, and
+command-line args into a Config, whose values can't change during the
+run and whose digest is stable across runs and processes.'''
+
+# Typical use:
+#     schema = ConfigSchema('pipeVue0', dict(SF=100, endGap=0.03, f=''))
+#     cfg, flubs = schema.resolve(argv[1:])       # CLI only, to get f
+#     ...                                         # Load file cfg.f
+#     cfg, flubs = schema.resolve(fileParams, schema.environ(), argv[1:])
+#     cfg.SF, cfg['endGap'], cfg.digest(['SF', 'endGap'])
+#
+# A parameter's type is that of its default: int, float, bool, or
+# str.  bool values are parsed as by isTrue.  Each layer is a dict of
+# name: value, a params text like "SF=50 endGap=.02", or a list of
+# args; later layers override earlier ones.  Args without `=` set the
+# schema's positional params in order (as jgenArg did).  Names not in
+# the schema and values that don't convert are returned as flubs, and
+# leave the previous value in place.
+#
+# schema.environ() gets values from environment variables named by
+# the schema's prefix and the param name, eg PIPEVUE0_SF=50.  The
+# usual layering is defaults < file params < environment < CLI.
+#
+# A Config pickles as its values dict, so it is cheap to pass to worker
+# processes, and it is hashable, so it (or cfg.digest(names) for a
+# subset of params) can key render caches.
+
+import json, os
+from hashlib import sha1
+
+def isTrue(x):
+    '''Return false if x is None, or False, or an empty string, or a
+    string beginning with f, F, N, or n.  Else, return True.    '''
+    return not str(x)[:1] in 'fFNn'
+
+class Config:
+    '''Immutable set of parameter values, readable as attributes or by
+    name'''
+    __slots__ = ('_values',)
+    def __init__(self, values):
+        object.__setattr__(self, '_values', dict(values))
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+    def __setattr__(self, name, value):
+        raise AttributeError(f'Config is immutable; cannot set {name}')
+    def __getitem__(self, name):
+        return self._values[name]
+    def __contains__(self, name):
+        return name in self._values
+    def __iter__(self):
+        return iter(self._values)
+    def items(self):
+        return self._values.items()
+    def asDict(self, names=None):
+        '''Return a dict of values, of all params or of those in names'''
+        return {k: self._values[k] for k in (self._values if names is None else names)}
+    def digest(self, names=None):
+        '''Return hex sha1 of values, of all params or of those in names'''
+        text = json.dumps(self.asDict(names), sort_keys=True)
+        return sha1(text.encode()).hexdigest()
+    def __eq__(self, other):
+        return isinstance(other, Config) and self._values == other._values
+    def __hash__(self):
+        return hash(self.digest())
+    def __reduce__(self):
+        return (Config, (self._values,))
+    def __repr__(self):
+        return 'Config({})'.format(', '.join(f'{k}={v!r}' for k, v in sorted(self._values.items())))
+
+class ConfigSchema:
+    '''Declared parameters of a program: names with default values,
+    whose types set how given values get converted'''
+    def __init__(self, program, defaults, positional=()):
+        self.program = program
+        self.defaults = dict(defaults)
+        self.positional = tuple(positional)
+        self.envPrefix = program.upper().replace('-', '_') + '_'
+
+    def convert(self, name, value):
+        '''Return value converted to the type of param name's default.
+        Raises KeyError for unknown names, ValueError for bad values.'''
+        kind = type(self.defaults[name])
+        if kind == bool:
+            return isTrue(value)
+        if kind == int and isinstance(value, float) and not value.is_integer():
+            raise ValueError(value)
+        return kind(value)
+
+    def pairs(self, layer):
+        '''Return list of (name, value) pairs from a layer: a dict, a
+        params text, or a list of args'''
+        if isinstance(layer, dict):
+            return list(layer.items())
+        args = layer.split() if isinstance(layer, str) else layer
+        pairs, npos = [], 0
+        for arg in args:
+            name, eq, value = arg.partition('=')
+            if not eq:
+                name, value = (self.positional[npos] if npos < len(self.positional) else arg), arg
+                npos += 1
+            pairs.append((name, value))
+        return pairs
+
+    def environ(self, env=None):
+        '''Return dict of param values given by environment variables'''
+        env = os.environ if env is None else env
+        n = len(self.envPrefix)
+        return {k[n:]: v for k, v in env.items() if k.startswith(self.envPrefix) and k[n:] in self.defaults}
+
+    def resolve(self, *layers):
+        '''Return a Config of defaults overridden by each layer in turn,
+        and a string listing any flubs (unknown names or bad values)'''
+        values, flubs = dict(self.defaults), ''
+        for layer in layers:
+            for name, value in self.pairs(layer):
+                try:
+                    values[name] = self.convert(name, value)
+                except (KeyError, ValueError, TypeError):
+                    flubs += f' [ {name} {value} ] '
+        return Config(values), flubs
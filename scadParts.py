@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+'''Module to write a SolidPython assembly as a small main .scad file
+that includes one .scad file per part.  Each part file is named by a
+hash of its content, so on a re-run only the parts whose content
+changed get written.  Unchanged part files keep their old contents
+and times, letting OpenSCAD reuse its cached results for them.'''
+
+# Part files go into directory <name>-parts beside main file
+# <name>.scad, and the main file says `include <name-parts/hash.scad>`
+# for each part.  Part files no longer referenced get removed.  The
+# main file itself is rewritten only if its text changes.
+
+# With perFile > 1 (for assemblies of many small parts, eg pipeVue0's
+# posts and tubes), parts with the same label are bundled, about
+# perFile to a file.  Each part goes into the bundle picked by a hash of
+# its code, so editing one part changes just its own bundle's file,
+# while adding or removing parts shifts no others (until a label's
+# bundle count changes).  The main file then has one include per
+# bundle, and so stays short.
+
+# scadModule and scadModules return SCAD text that defines named
+# modules, for programs that make each distinct part (eg a thread, rail,
+# or unit) once, place calls of its module, and put the definitions in
+# the file header.
+
+# writeBodies instead writes one self-contained .scad file per body
+# (eg per colour or material), <name>-<body>.scad, for slicing and
+# printing bodies separately.  Bodies are rendered from objects built
+# once by the caller.  (They're rendered in-process: SolidPython
+# objects keep parent links into the whole assembly, so pickling a
+# body for a worker process costs more than rendering it.)
+
+import os
+from hashlib import sha1
+
+def partsDirName(scadFile):
+    '''Return name of directory holding part files of scadFile'''
+    return os.path.splitext(scadFile)[0] + '-parts'
+
+def writeIfChanged(fiName, text):
+    '''Write text to file fiName unless the file already holds that
+    text.  Return True if file was written.  Writing goes via a temp
+    file and rename, so OpenSCAD never sees a partly-written file.'''
+    try:
+        with open(fiName) as fi:
+            if fi.read() == text:
+                return False
+    except IOError:
+        pass
+    tmpName = fiName + '.tmp'
+    with open(tmpName, 'w') as fo:
+        fo.write(text)
+    os.replace(tmpName, fiName)
+    return True
+
+def bundleCodes(parts, perFile):
+    '''Return list of (label, code) bundles of SCAD code of parts, a
+    list of (label, obj) pairs: one per part if perFile is 1, else
+    parts with the same label bundled by hash about perFile per bundle'''
+    from solid import scad_render
+    if perFile <= 1:
+        return [(label, scad_render(obj)) for label, obj in parts]
+    groups = {}                 # label: list of part codes
+    for label, obj in parts:
+        groups.setdefault(label, []).append(scad_render(obj))
+    bundles = []
+    for label, codes in groups.items():
+        nb = -(-len(codes) // perFile)
+        if nb == 1:
+            bundles.append((label, ''.join(codes)))
+            continue
+        bins = [[] for _ in range(nb)]
+        for code in codes:
+            bins[int(sha1(code.encode()).hexdigest()[:8], 16) % nb].append(code)
+        bundles += [(f'{label} {k+1}/{nb}', ''.join(b)) for k, b in enumerate(bins) if b]
+    return bundles
+
+def writeSplitScad(parts, scadFile, header='', perFile=1):
+    '''Write parts to per-part include files and write scadFile to
+    include them.  parts is a list of (label, obj) pairs, where obj
+    is a SolidPython object and label is a short description, used in
+    a comment.  header (eg '$fn = 30;') goes at top of main file.  If
+    perFile > 1, parts with the same label share files, about perFile
+    parts per file.  Returns counts of part files written, unchanged,
+    and removed.'''
+    pDir = partsDirName(scadFile)
+    os.makedirs(pDir, exist_ok=True)
+    inDir = os.path.basename(pDir)
+    oldFiles = set(f for f in os.listdir(pDir) if f.endswith('.scad'))
+    used, lines = set(), [header, '']
+    nNew = nOld = 0
+    for label, code in bundleCodes(parts, perFile):
+        name = sha1(code.encode()).hexdigest()[:16] + '.scad'
+        if name not in used:
+            used.add(name)
+            if name in oldFiles:
+                nOld += 1
+            else:
+                writeIfChanged(os.path.join(pDir, name), code)
+                nNew += 1
+        lines.append(f'include <{inDir}/{name}>  // {label}')
+    gone = oldFiles - used
+    for name in gone:
+        os.remove(os.path.join(pDir, name))
+    writeIfChanged(scadFile, '\n'.join(lines) + '\n')
+    return nNew, nOld, len(gone)
+
+def indented(text):
+    '''Return text, less blank lines at its ends, with lines indented'''
+    return '\n'.join('\t'+line for line in text.strip('\n').split('\n'))
+
+def scadModule(name, obj, comment=''):
+    '''Return SCAD text defining module name() as SolidPython object
+    obj, after a // comment line if comment is given'''
+    from solid import scad_render
+    head = '// {}\n'.format(comment) if comment else ''
+    return '{}module {}() {{\n{}\n}}'.format(head, name, indented(scad_render(obj)))
+
+def scadModules(defs):
+    '''Return SCAD text defining a module for each (name, obj) pair in
+    defs, each after a blank line'''
+    return ''.join('\n\n' + scadModule(name, obj) for name, obj in defs)
+
+def renderBody(objs, header):
+    '''Return OpenSCAD code for a union of SolidPython objects objs,
+    with header at top'''
+    from solid import scad_render, union
+    return scad_render(union()(objs), file_header=header)
+
+def bodyFileName(scadFile, body):
+    '''Return name of the file for body of scadFile'''
+    return '{}-{}.scad'.format(os.path.splitext(scadFile)[0], body)
+
+def writeBodies(bodies, scadFile, header=''):
+    '''Write each body to its own .scad file beside scadFile, unless
+    the file already holds that text.  bodies is a dict of body name:
+    list of SolidPython objects; header goes at top of each file.
+    Returns a list of (file name, number of objects, True if file was
+    written).'''
+    done = []
+    for body, objs in bodies.items():
+        fiName = bodyFileName(scadFile, body)
+        done.append((fiName, len(objs), writeIfChanged(fiName, renderBody(objs, header))))
+    return done
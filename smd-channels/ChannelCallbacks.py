@@ -4,7 +4,6 @@
 # and data, for use in loadTablesForXML module.  By jiw 28 Feb 2019
 
 import sys
-from PyQt5.QtWidgets   import QFileDialog
 from ChannelVars       import Table1, Table2, Table3, Table4
 class CallData:
     '''1. Provide methods to make callback closures, to be called by
@@ -23,6 +22,7 @@ class CallData:
     def __init__(self):
         pass
     autoProduce = False
+    splitOutput = False    # If true, write per-unit scad include files
     @classmethod
     def setProducers(c, producer_list):
         c.producer_funcs = producer_list
@@ -32,9 +32,11 @@ class CallData:
     def calcVols(c, mains):  return c.producer_funcs[0](mains)
     @classmethod
     def produceOutput(c, mains): return c.producer_funcs[1](mains)
+    @classmethod
+    def batchProduce(c, mains, rows): return c.producer_funcs[2](mains, rows)
     
     @staticmethod
-    def buttonLabels():      return ['Quit', 'Save', 'Produce', 'AutoProd'] #, 'Load'
+    def buttonLabels():      return ['Quit', 'Save', 'Produce', 'AutoProd', 'SplitOut', 'BatchProd'] #, 'Load'
     @staticmethod
     def tableNames():        return ['tapetypes', 'railspecs', 'unitlist', 'instructions']
     
@@ -90,6 +92,7 @@ class CallData:
     #---------------------------------------------
     @staticmethod
     def saveXML(etree, mains):
+        from PyQt5.QtWidgets import QFileDialog # (Only the Qt app saves)
         stuff = QFileDialog.getSaveFileName(mains, 'Save File')
         name = str(stuff[0])
 
@@ -125,6 +128,10 @@ class CallData:
         elif bt=='Produce':  c.produceOutput(mains)
         elif bt=='Save':     c.saveXML(etree, mains)
         elif bt=='AutoProd': c.autoProduce = not c.autoProduce
+        elif bt=='SplitOut': c.splitOutput = not c.splitOutput
+        elif bt=='BatchProd':   # Selected rail rows, or all if none
+            rows = sorted(set(x.row() for x in mains.tab2.selectedIndexes()))
+            c.batchProduce(mains, rows or None)
         else:
             print ('B{} {} {} click'.format(bun, bt, bu.text()))
     #---------------------------------------------
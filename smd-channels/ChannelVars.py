@@ -1,6 +1,8 @@
 # Module:  ChannelVars.py
 # Get/Put variables for .xml file ./smd-channels3.xml
-# Generated Thu Mar  7 19:51:33 2019 by ./make-xml-accessors.py
+# Generated Mon Oct 19 16:14:53 2026 by ./make-xml-accessors.py
+# Schema hash: 5d7a596e5925265d15317666d60379a99400ab95
+from collections import namedtuple
 def xml_float(s):
     try:
         return float(s)
@@ -11,6 +13,17 @@ def xml_int(s):
         return int(s)
     except ValueError:
         return -1
+def xml_cells(ro, texts, cues, fmts, bad):
+    '''Return texts converted per fmts, as xml_float and xml_int do;
+    add (ro, cue, text, problem) to bad for each that fails'''
+    cells = []
+    for txt, cue, fmt in zip(texts, cues, fmts):
+        try:
+            cells.append(float(txt) if fmt=='f' else int(txt) if fmt=='i' else txt)
+        except ValueError:
+            cells.append(-1. if fmt=='f' else -1)
+            bad.append((ro, cue, txt, 'not a number'))
+    return cells
 
 class Table1:  # Class: Accessors for a row of tab1 / tapes / Tape Data
     def __init__(self,tab,ro):  self.tab, self.ro = tab, ro
@@ -68,6 +81,35 @@ class Table1:  # Class: Accessors for a row of tab1 / tapes / Tape Data
     @staticmethod
     def colOhoa():         return  7   #      f     Ohoa           Over.2 alt
 
+    @staticmethod
+    def colIndex():             return {'name': 0, 'nick': 1, 'wide': 2, 'high': 3, 'oh1': 4, 'oho': 5, 'oh1a': 6, 'ohoa': 7}
+    @staticmethod
+    def colDefaults():          return ['', '', '0', '0', '0', '0', '0', '0']
+    Row = namedtuple('Table1Row', ['Name', 'Nick', 'Wide', 'High', 'Oh1', 'Oho', 'Oh1a', 'Ohoa'])
+    def values(self):
+        '''Return a Row of this row's cells, typed as getters type them'''
+        ro, item = self.ro, self.tab.item
+        return Table1.Row(*xml_cells(ro, [item(ro,0).text(), item(ro,1).text(), item(ro,2).text(), item(ro,3).text(), item(ro,4).text(), item(ro,5).text(), item(ro,6).text(), item(ro,7).text()], Table1.colCues(), Table1.colFmts(), []))
+    @staticmethod
+    def decodeRows(rows):
+        '''Return (texts, bad) for rows, a list of row-attribute dicts:
+        lists of cell texts, with defaults for missing cells; and
+        (row#, key, text, problem) for each unknown key or
+        unconvertible number'''
+        texts, bad = [], []
+        known = Table1.colIndex().keys()
+        for ro, a in enumerate(rows):
+            g = a.get
+            t = [g('name', ''), g('nick', ''), g('wide', '0'), g('high', '0'), g('oh1', '0'), g('oho', '0'), g('oh1a', '0'), g('ohoa', '0')]
+            try:
+                float(t[2]), float(t[3]), float(t[4]), float(t[5]), float(t[6]), float(t[7])
+            except ValueError:
+                xml_cells(ro, t, Table1.colCues(), Table1.colFmts(), bad)
+            if not a.keys() <= known:
+                bad += [(ro, k, a[k], 'unknown key') for k in a if k not in known]
+            texts.append(t)
+        return texts, bad
+
 class Table2:  # Class: Accessors for a row of tab2 / rails / Unit Specs
     def __init__(self,tab,ro):  self.tab, self.ro = tab, ro
     ''' __init__ sets values of .tab and .ro variables'''
@@ -160,6 +202,35 @@ class Table2:  # Class: Accessors for a row of tab2 / rails / Unit Specs
     @staticmethod
     def colOutput():       return 16   #      s     Output         Output
 
+    @staticmethod
+    def colIndex():             return {'label': 0, 'Use': 1, 'CapWide': 2, 'CapLen': 3, 'EndLen': 4, 'PadLen': 5, 'Slack': 6, 'Posts': 7, 'PostOffset': 8, 'PostID': 9, 'PostOD': 10, 'LegThik': 11, 'CapThik': 12, 'Bridges': 13, 'BridgeOffset': 14, 'BridgeWide': 15, 'Output': 16}
+    @staticmethod
+    def colDefaults():          return ['', '', '0', '0', '0', '0', '0.1', '0', '0', '0', '0', '0', '0', '0', '0', '0', 'ELPR']
+    Row = namedtuple('Table2Row', ['Label', 'Use', 'CapWide', 'CapLen', 'EndLen', 'PadLen', 'Slack', 'Posts', 'PostOffset', 'PostID', 'PostOD', 'LegThik', 'CapThik', 'Bridges', 'BridgeOffset', 'BridgeWide', 'Output'])
+    def values(self):
+        '''Return a Row of this row's cells, typed as getters type them'''
+        ro, item = self.ro, self.tab.item
+        return Table2.Row(*xml_cells(ro, [item(ro,0).text(), item(ro,1).text(), item(ro,2).text(), item(ro,3).text(), item(ro,4).text(), item(ro,5).text(), item(ro,6).text(), item(ro,7).text(), item(ro,8).text(), item(ro,9).text(), item(ro,10).text(), item(ro,11).text(), item(ro,12).text(), item(ro,13).text(), item(ro,14).text(), item(ro,15).text(), item(ro,16).text()], Table2.colCues(), Table2.colFmts(), []))
+    @staticmethod
+    def decodeRows(rows):
+        '''Return (texts, bad) for rows, a list of row-attribute dicts:
+        lists of cell texts, with defaults for missing cells; and
+        (row#, key, text, problem) for each unknown key or
+        unconvertible number'''
+        texts, bad = [], []
+        known = Table2.colIndex().keys()
+        for ro, a in enumerate(rows):
+            g = a.get
+            t = [g('label', ''), g('Use', ''), g('CapWide', '0'), g('CapLen', '0'), g('EndLen', '0'), g('PadLen', '0'), g('Slack', '0.1'), g('Posts', '0'), g('PostOffset', '0'), g('PostID', '0'), g('PostOD', '0'), g('LegThik', '0'), g('CapThik', '0'), g('Bridges', '0'), g('BridgeOffset', '0'), g('BridgeWide', '0'), g('Output', 'ELPR')]
+            try:
+                float(t[2]), float(t[3]), float(t[4]), float(t[5]), float(t[6]), int(t[7]), float(t[8]), float(t[9]), float(t[10]), float(t[11]), float(t[12]), int(t[13]), float(t[14]), float(t[15])
+            except ValueError:
+                xml_cells(ro, t, Table2.colCues(), Table2.colFmts(), bad)
+            if not a.keys() <= known:
+                bad += [(ro, k, a[k], 'unknown key') for k in a if k not in known]
+            texts.append(t)
+        return texts, bad
+
 class Table3:  # Class: Accessors for a row of tab3 / makes / Units to Make
     def __init__(self,tab,ro):  self.tab, self.ro = tab, ro
     ''' __init__ sets values of .tab and .ro variables'''
@@ -192,6 +263,35 @@ class Table3:  # Class: Accessors for a row of tab3 / makes / Units to Make
     @staticmethod
     def colVolRO():        return  1   #      f     VolRO          Unit volume
 
+    @staticmethod
+    def colIndex():             return {'ttype': 0, 'volRO': 1}
+    @staticmethod
+    def colDefaults():          return ['', '0']
+    Row = namedtuple('Table3Row', ['Ttype', 'VolRO'])
+    def values(self):
+        '''Return a Row of this row's cells, typed as getters type them'''
+        ro, item = self.ro, self.tab.item
+        return Table3.Row(*xml_cells(ro, [item(ro,0).text(), item(ro,1).text()], Table3.colCues(), Table3.colFmts(), []))
+    @staticmethod
+    def decodeRows(rows):
+        '''Return (texts, bad) for rows, a list of row-attribute dicts:
+        lists of cell texts, with defaults for missing cells; and
+        (row#, key, text, problem) for each unknown key or
+        unconvertible number'''
+        texts, bad = [], []
+        known = Table3.colIndex().keys()
+        for ro, a in enumerate(rows):
+            g = a.get
+            t = [g('ttype', ''), g('volRO', '0')]
+            try:
+                float(t[1])
+            except ValueError:
+                xml_cells(ro, t, Table3.colCues(), Table3.colFmts(), bad)
+            if not a.keys() <= known:
+                bad += [(ro, k, a[k], 'unknown key') for k in a if k not in known]
+            texts.append(t)
+        return texts, bad
+
 class Table4:  # Class: Accessors for a row of tab4 / hints / Instructions
     def __init__(self,tab,ro):  self.tab, self.ro = tab, ro
     ''' __init__ sets values of .tab and .ro variables'''
@@ -220,7 +320,34 @@ class Table4:  # Class: Accessors for a row of tab4 / hints / Instructions
     @staticmethod          #    Column #   Format     Id           Column-name 
     def colItem():         return  0   #      s     Item           How to use these tables:
 
+    @staticmethod
+    def colIndex():             return {'item': 0}
+    @staticmethod
+    def colDefaults():          return ['']
+    Row = namedtuple('Table4Row', ['Item'])
+    def values(self):
+        '''Return a Row of this row's cells, typed as getters type them'''
+        ro, item = self.ro, self.tab.item
+        return Table4.Row(item(ro,0).text())
+    @staticmethod
+    def decodeRows(rows):
+        '''Return (texts, bad) for rows, a list of row-attribute dicts:
+        lists of cell texts, with defaults for missing cells; and
+        (row#, key, text, problem) for each unknown key or
+        unconvertible number'''
+        texts, bad = [], []
+        known = Table4.colIndex().keys()
+        for ro, a in enumerate(rows):
+            g = a.get
+            t = [g('item', '')]
+            if not a.keys() <= known:
+                bad += [(ro, k, a[k], 'unknown key') for k in a if k not in known]
+            texts.append(t)
+        return texts, bad
+
 def tableCount():       return 4
 def tableCues():        return ['tapes', 'rails', 'makes', 'hints']
 def tableNums():        return ['1', '2', '3', '4']
 def tableNames():       return ['Tape Data', 'Unit Specs', 'Units to Make', 'Instructions']
+def schemaHash():       return '5d7a596e5925265d15317666d60379a99400ab95'
+def tableClasses():     return {'1': Table1, '2': Table2, '3': Table3, '4': Table4}
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# Module to keep an accessor module (eg ChannelVars.py) in step with
+# the table schema in a .xml file.  The schema hash covers the table
+# and column specs that make-xml-accessors uses (not row data or
+# tooltips), and make-xml-accessors records it in the module's header.
+# refreshAccessors compares hashes and, only when they differ,
+# regenerates the module and byte-compiles it into __pycache__, so
+# later startups just import the cached module.
+
+# refreshAccessors must run before the accessor module is first
+# imported, because modules that say `from ChannelVars import Table1`
+# keep the classes they got.  loadTablesForXML and smd-channelsProduce
+# call it ahead of their ChannelVars imports, with the specs file
+# named in the program args, found by specsFileArg.  Its examples
+# run as tests via `python3 -m doctest accessorCache.py`.
+
+import importlib, os, py_compile, sys
+from hashlib import sha1
+from xml.etree import ElementTree
+thisDir = os.path.dirname(os.path.abspath(__file__))
+checked = {}                    # (specsFile, modFi): hash, of checks made
+#---------------------------------------------
+def schemaHash(etree):
+    '''Return hex sha1 of table and column specs in XML tree etree'''
+    h = sha1()
+    for kid in etree.getroot():
+        if kid.tag == 'table' and kid.attrib.get('tab', None) != None:
+            h.update(repr([kid.attrib.get(x) for x in ('tab', 'cue', 'name')]).encode())
+            for elt in kid:
+                if elt.tag == 'columnData':
+                    for col in elt:
+                        h.update(repr([col.attrib.get(x) for x in ('col', 'cue', 'name', 'fmt', 'val')]).encode())
+    return h.hexdigest()
+#---------------------------------------------
+def moduleHash(modFi):
+    '''Return schema hash recorded in header of module file modFi, or
+    None if file or hash is missing'''
+    try:
+        with open(modFi) as fi:
+            for k, line in zip(range(8), fi):
+                if line.startswith('# Schema hash: '):
+                    return line.split()[-1]
+    except IOError:
+        pass
+    return None
+#---------------------------------------------
+def specsFileArg(argv, default='./smd-channels3.xml'):
+    '''Return .xml file name from the first arg in argv[1:] that isn't
+    a flag (as loadAndShow takes it, after flags are removed), or
+    default.  Flags (eg --batch) may come before the file name:
+
+    >>> specsFileArg(['prog', '--batch', '--preview=6', 'other.xml'])
+    'other.xml'
+    >>> specsFileArg(['prog', '--batch=0,2'])
+    './smd-channels3.xml'
+    '''
+    args = [a for a in argv[1:] if not a.startswith('-')]
+    return args[0] if args and args[0].endswith('.xml') else default
+#---------------------------------------------
+def refreshAccessors(specsFile, modFi=os.path.join(thisDir, 'ChannelVars.py')):
+    '''Regenerate accessor module modFi from specsFile if its schema
+    hash is out of date.  Return True if the module was regenerated.
+    Does nothing if specsFile can't be read; loading reports that.'''
+    key = (os.path.abspath(specsFile), modFi)
+    if key in checked:
+        return False
+    try:
+        etree = ElementTree.parse(specsFile)
+    except (IOError, ElementTree.ParseError):
+        return False
+    checked[key] = hash = schemaHash(etree)
+    if moduleHash(modFi) == hash:
+        return False
+    maker = importlib.import_module('make-xml-accessors')
+    tmpFi = modFi + '.tmp'
+    with open(tmpFi, 'w') as modo:
+        maker.makeModule(specsFile, os.path.basename(modFi), modo, etree)
+    os.replace(tmpFi, modFi)
+    py_compile.compile(modFi)   # Cache compiled form for next startup
+    importlib.invalidate_caches()
+    modName = os.path.splitext(os.path.basename(modFi))[0]
+    if modName in sys.modules:  # (Too late for modules that imported it)
+        importlib.reload(sys.modules[modName])
+    print ('Regenerated {} for schema of {}'.format(modFi, specsFile))
+    return True
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+'''Headless benchmark and regression check for smd-channelsProduce.
+Loads .xml specs with synthetic tape catalogs and unit lists of
+increasing size, times the table, volume, tree-building, and render
+stages, and checks computed volumes and spans against golden values.'''
+
+# Params are keyword=value forms, in any order:
+#   sizes=10,40,160        Numbers of units (and of synthetic tape types)
+#   specs=smd-channels3.xml  Base specs; its Unit Specs table (and its
+#                          marked row) are used, and synthetic rows are
+#                          added to its Tape Data and Units to Make tables
+#   out=bench-channels.json  File to record stage times in
+#   golden=benchChannels-golden.json  Golden volumes and spans
+#   update=f               If t, write current values as golden values
+# (Params can also come from BENCHCHANNELS_<name> environment variables;
+# see runConfig.py.)
+#
+# Each size also checks that split output (as by the SplitOut button)
+# cuts the same post holes as single-file output, in units and in
+# bridges.  Exit status is 1 if any volume or span differs from its
+# golden value, or if any hole set differs.
+
+import importlib, json, os, sys, tempfile
+from xml.etree import ElementTree
+from solid import scad_render_to_file # (loaded here so stage times exclude it)
+thisDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, thisDir)
+sys.path.append(os.path.dirname(thisDir))
+from runConfig import ConfigSchema
+from headlessTables import loadHeadless
+from ChannelVars import Table3
+prod = importlib.import_module('smd-channelsProduce')
+
+def syntheticSpecs(baseFile, n, outFile):
+    '''Write to outFile a copy of baseFile with n synthetic tape types
+    added to table 1, and table 3 rows for n units of them'''
+    etree = ElementTree.parse(baseFile)
+    for tab in etree.getroot().findall('table'):
+        if tab.attrib.get('tab') == '1':
+            for i in range(n):
+                ElementTree.SubElement(tab, 'row', name=f'syn{i}',
+                    wide=str((8, 12, 16, 24)[i%4]), high=f'{0.5+(i*37%55)/10:0.1f}',
+                    oh1='2', oho=f'{0.8+(i%3)*0.35:0.2f}', oh1a='1', ohoa='0')
+        if tab.attrib.get('tab') == '3':
+            for row in tab.findall('row'):
+                tab.remove(row)
+            picks = ['null'] + [f'syn{i*7%n}' for i in range(n-1)] + ['null']
+            for ttype in picks:
+                ElementTree.SubElement(tab, 'row', ttype=ttype, volRO='0')
+    etree.write(outFile)
+
+def holeSet(obj, at=(0, 0, 0), inHole=False):
+    '''Return set of (position, module name) for module calls within
+    hole() nodes in obj, position being the sum of translate vectors
+    above the call'''
+    if obj.name == 'translate':
+        at = tuple(round(a+b, 6) for a, b in zip(at, obj.params['v']))
+    inHole = inHole or obj.is_hole
+    if inHole and not obj.children:
+        return {(at, obj.name)}
+    return set().union(*[holeSet(c, at, inHole) for c in obj.children])
+
+def splitHoleFlubs(asm, units, bridgeAsm):
+    '''Return number of ways split parts' holes differ from those of
+    single-file assembly asm'''
+    whole, flubs = holeSet(asm), 0
+    parts = dict(prod.splitParts(units, bridgeAsm))
+    inUnits = set().union(*[holeSet(p) for label, p in parts.items() if label != 'bridges'])
+    if inUnits != whole:
+        print (f'Split units have {len(inUnits)} holes vs {len(whole)} in single file')
+        flubs += 1
+    if bridgeAsm and holeSet(parts['bridges']) != whole:
+        print (f'Split bridges have {len(holeSet(parts["bridges"]))} holes vs {len(whole)} in single file')
+        flubs += 1
+    return flubs
+
+def runOne(baseFile, n, workDir):
+    '''Run stages for n units; return (times, golden-check values,
+    split-hole flubs)'''
+    specsFile = os.path.join(workDir, f'bench-{n}.xml')
+    syntheticSpecs(baseFile, n, specsFile)
+    prof = prod.StageProfile(f'benchChannels {n}')
+    with prof.stage('load'):
+        mains = loadHeadless(specsFile)
+    with prof.stage('tapes'):
+        tapes = prod.getTapeDataList(mains)
+    with prof.stage('volumes'):
+        prod.calcVols(mains)
+    rail = prod.RailData(mains, 0.02)
+    asm, units, bridgeAsm, protos = prod.makeAssembly(rail, tapes, prof)
+    with prof.stage('render'):
+        scad_render_to_file(asm, os.path.join(workDir, 'bench.scad'),
+                            file_header='$fn = 44;' + prod.moduleDefs(protos),
+                            include_orig_code=False)
+    tab3 = mains.tab3
+    vols = [tab3.item(ro, Table3.colVolRO()).text() for ro in range(tab3.rowCount())]
+    span = round(prod.unitSpan(rail, tapes)[1], 6)
+    prof.count('units', len(units))
+    prof.count('nodes', prod.countNodes(asm))
+    print (prof.summary())
+    return prof.asDict(), {'span': span, 'vols': vols}, splitHoleFlubs(asm, units, bridgeAsm)
+
+if __name__ == '__main__':
+    schema = ConfigSchema('benchChannels', dict(sizes='10,40,160',
+                          specs=os.path.join(thisDir, 'smd-channels3.xml'),
+                          out='bench-channels.json', update=False,
+                          golden=os.path.join(thisDir, 'benchChannels-golden.json')))
+    par, flubs = schema.resolve(schema.environ(), sys.argv[1:])
+    if flubs:
+        sys.exit(f'Parameter-setting fail: {flubs}; params are {" ".join(schema.defaults)}')
+    workDir = tempfile.mkdtemp(prefix='benchChannels-')
+    times, values, holeFlubs = [], {}, 0
+    for n in [int(s) for s in par.sizes.split(',')]:
+        t, v, h = runOne(par.specs, n, workDir)
+        times.append(t)
+        values[str(n)] = v
+        holeFlubs += h
+    for fi in os.listdir(workDir):
+        os.remove(os.path.join(workDir, fi))
+    os.rmdir(workDir)
+    with open(par.out, 'w') as fo:
+        json.dump(times, fo, indent=1)
+    print (f'Wrote stage times to {par.out}')
+
+    if par.update:
+        with open(par.golden, 'w') as fo:
+            json.dump(values, fo, indent=1)
+        print (f'Wrote golden values to {par.golden}')
+        sys.exit(0)
+    with open(par.golden) as fi:
+        golden = json.load(fi)
+    flubs = holeFlubs
+    for n, v in values.items():
+        g = golden.get(n)
+        if g is None:
+            print (f'No golden values for size {n}')
+            continue
+        if abs(v['span'] - g['span']) > 1e-6:
+            print (f'Size {n}: span {v["span"]} vs golden {g["span"]}')
+            flubs += 1
+        for ro, (a, b) in enumerate(zip(v['vols'], g['vols'])):
+            if a != b:
+                print (f'Size {n}: row {ro} volume {a} vs golden {b}')
+                flubs += 1
+        if len(v['vols']) != len(g['vols']):
+            print (f'Size {n}: {len(v["vols"])} volumes vs {len(g["vols"])} golden')
+            flubs += 1
+    print (f'{flubs} differences from golden values')
+    sys.exit(1 if flubs else 0)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+# Module to compute volumes of the units and bridges produced by
+# smd-channelsProduce, in closed form, from the same specs that
+# makeUnit and makeBridges use.  No CSG tree is built, so a unit's
+# volume takes well under a millisecond.
+
+# Volumes are of the idealized geometry: the eps overlaps that
+# makeUnit adds (to avoid coincident faces) are ignored.  Each piece
+# (cap, legs ring, ramp fillers, posts, bridges) is measured exactly,
+# including half-round ends, post holes, and setback cutouts, where
+# cutouts are subtracted from cap and ramp fillers via the exact
+# integral of their overlap, and posts' overlaps with legs and ramp
+# fillers are subtracted.  Assumptions: cutouts, posts, and bridges
+# lie within the straight (not half-round) part of the cap, and posts
+# do not reach cutouts or half-round ends of legs.
+
+from math import pi, sqrt, acos
+
+plaDensity = 1.24               # g/cm^3, typical for PLA filament
+#--------------------------------------------------
+def massGrams(vol, density=plaDensity):
+    '''Return mass in grams of vol mm^3 of material of given density'''
+    return vol * density / 1000
+#--------------------------------------------------
+def discsArea(dist, diam):
+    '''Return area of union of two discs of diameter diam, whose
+    centers are dist apart'''
+    r, d = diam/2, abs(dist)
+    if r <= 0: return 0
+    if d >= 2*r: return 2*pi*r*r
+    lens = 2*r*r*acos(d/(2*r)) - (d/2)*sqrt(4*r*r - d*d)
+    return 2*pi*r*r - lens
+#--------------------------------------------------
+def cappedArea(leng, wide):
+    '''Return plan area of a cappedCube: a leng by wide rectangle
+    plus half-rounds of diameter wide at each end'''
+    if wide <= 0: return 0
+    if leng >= 0: return leng*wide + pi*wide*wide/4
+    return discsArea(leng, wide) # (cube of negative size is empty)
+#--------------------------------------------------
+def discBelow(r, d):
+    '''Return area of the part of a disc of radius r that is below a
+    line at distance d above its center'''
+    d = max(-r, min(r, d))
+    return r*r*acos(-d/r) + d*sqrt(r*r - d*d)
+#--------------------------------------------------
+def discStripArea(diam, yc, y0, y1):
+    '''Return area of the part of a disc of diameter diam, centered
+    at y=yc, that lies within y0 <= y <= y1'''
+    r = diam/2
+    if r <= 0 or y1 <= y0: return 0
+    return discBelow(r, y1-yc) - discBelow(r, y0-yc)
+#--------------------------------------------------
+def rampArea(leng, high):
+    '''Return side area of a rampBar of length leng and height high:
+    its ends ramp in at 45 degrees, so at height z its length is
+    leng-2z.  Also gives plan area of rampSide setback cutouts.'''
+    m = min(high, leng/2)
+    return leng*m - m*m if m > 0 else 0
+#--------------------------------------------------
+def cutWidthIntegral(x0, x1, start, leng, wide):
+    '''Return integral over x0 <= x <= x1 of the width of a setback
+    cutout (a rampSide, length leng, width wide, starting at x=start)
+    at x.  Width at x is min(wide, x-start, start+leng-x), or 0.'''
+    w = min(wide, leng/2)
+    if w <= 0 or x1 <= x0: return 0
+    def width(x):
+        return max(0, min(w, x-start, start+leng-x))
+    xs = sorted(set([x0, x1] + [x for x in (start, start+w, start+leng-w, start+leng)
+                                if x0 < x < x1]))
+    return sum((b-a)*(width(a)+width(b))/2 for a, b in zip(xs, xs[1:]))
+#--------------------------------------------------
+def splitPoly(poly, a, b, c):
+    '''Split convex polygon poly (list of (u,s) points) by line
+    a*u+b*s = c; return the parts on each side (maybe empty)'''
+    lo, hi = [], []
+    n = len(poly)
+    for k in range(n):
+        p, q = poly[k], poly[(k+1)%n]
+        vp, vq = a*p[0]+b*p[1]-c, a*q[0]+b*q[1]-c
+        if vp <= 0: lo.append(p)
+        if vp >= 0: hi.append(p)
+        if vp*vq < 0:
+            t = vp/(vp-vq)
+            x = (p[0]+t*(q[0]-p[0]), p[1]+t*(q[1]-p[1]))
+            lo.append(x)
+            hi.append(x)
+    return lo, hi
+#--------------------------------------------------
+def overlapIntegral(cutLo, cutHi, barLo, barHi, uMax, sMax):
+    '''Return integral over 0<=u<=uMax, 0<=s<=sMax of the length of
+    overlap of x intervals [cutLo, cutHi] and [barLo, barHi], where
+    each end is an affine function of u and s, given as a triple
+    (c, cu, cs) meaning c + cu*u + cs*s.
+
+    The overlap length is linear within each cell of the arrangement
+    of lines where two ends are equal, so the integral is a sum over
+    cells of cell area times overlap length at the cell centroid.'''
+    if uMax <= 0 or sMax <= 0: return 0
+    ends = (cutLo, cutHi, barLo, barHi)
+    def val(f, u, s): return f[0] + f[1]*u + f[2]*s
+    def length(u, s):
+        return max(0, min(val(cutHi,u,s), val(barHi,u,s)) - max(val(cutLo,u,s), val(barLo,u,s)))
+    cells = [[(0,0), (uMax,0), (uMax,sMax), (0,sMax)]]
+    for i in range(4):
+        for j in range(i+1, 4):
+            f, g = ends[i], ends[j]
+            a, b, c = f[1]-g[1], f[2]-g[2], g[0]-f[0]
+            if a == 0 and b == 0: continue
+            nxt = []
+            for cell in cells:
+                nxt += [p for p in splitPoly(cell, a, b, c) if len(p) > 2]
+            cells = nxt
+    total = 0
+    for cell in cells:
+        area = cu = cs = 0
+        for (u0,s0), (u1,s1) in zip(cell, cell[1:]+cell[:1]):
+            cross = u0*s1 - u1*s0
+            area += cross
+            cu += (u0+u1)*cross
+            cs += (s0+s1)*cross
+        if abs(area) > 1e-15:
+            total += abs(area/2) * length(cu/(3*area), cs/(3*area))
+    return total
+#--------------------------------------------------
+def cutRampVolume(rail, cutWide, rampHi):
+    '''Return volume of overlap of a setback cutout of width cutWide
+    with the ramp filler under it, of height rampHi.  At distance u
+    into the cutout from its long side, it spans x from EndLen+u to
+    EndLen+cutLen-u; at height s up the filler, the filler spans x
+    from PadLen+s to PadLen+rampLen-s.'''
+    E, P = rail.EndLen, rail.PadLen
+    C, LA = rail.CapLen - 2*E, rail.CapLen - 2*P
+    w, h = min(cutWide, C/2), min(rampHi, LA/2)
+    if w <= 0 or h <= 0: return 0
+    if E >= P+h and E+C <= P+LA-h: # Cutout within flat part of filler
+        return rampArea(C, w) * h
+    return overlapIntegral((E,1,0), (E+C,-1,0), (P,0,1), (P+LA,0,-1), w, h)
+#--------------------------------------------------
+def unitVolume(rail, tapeA, tapeB, maxHi):
+    '''Return volume, in mm^3, of the unit that makeUnit(rail, tapeA,
+    tapeB, maxHi) produces.'''
+    oEnds, oLegs, oPosts, oRamps = (c in rail.Output for c in 'ELPR')
+    W, L, T = rail.CapWide, rail.CapLen, rail.CapThik
+    if oEnds:
+        capArea = cappedArea(L-W, W)
+    else:
+        capArea = L*W if L > 0 and W > 0 else 0
+    vol, strips = 0, []         # strips: (y0, y1, height) of legs & fillers
+    if oLegs or oRamps:         # Cutouts only happen with legs or ramps
+        cutLen = L - 2*rail.EndLen
+        wA, wB = tapeA.oho - tapeA.ohoa, tapeB.oh1 - tapeB.oh1a
+        capArea -= rampArea(cutLen, wA) + rampArea(cutLen, wB)
+    if oRamps:                  # Filler strips along both edges
+        rampLen = L - 2*rail.PadLen
+        hA, hB = maxHi - tapeA.high, maxHi - tapeB.high
+        vol += tapeA.oho * rampArea(rampLen, hA) - cutRampVolume(rail, wA, hA)
+        vol += tapeB.oh1 * rampArea(rampLen, hB) - cutRampVolume(rail, wB, hB)
+        strips += [(0, tapeA.oho, hA), (W-tapeB.oh1, W, hB)]
+    if oLegs:                   # Ring of legs, with half-round ends
+        sepO = W - tapeA.oho - tapeB.oh1
+        sepI = sepO - 2*rail.LegThik
+        legLen = L - 2*rail.PadLen - sepO
+        vol += (cappedArea(legLen, sepO) - cappedArea(legLen, sepI)) * maxHi
+        y0, y1 = tapeA.oho, tapeA.oho + sepO
+        strips += [(y0, min(y1, y0+rail.LegThik), maxHi), (max(y0, y1-rail.LegThik), y1, maxHi)]
+    if oPosts and rail.nPosts > 0: # Posts rise above cap; holes go through it
+        ring = pi*(rail.PostOD**2 - rail.PostID**2)/4
+        vol += rail.nPosts * ring * maxHi
+        capArea -= rail.nPosts * pi*rail.PostID**2/4
+        # Where a post's disc overlaps legs or fillers, tube and hole
+        # replace what the legs or fillers would have had there
+        over = sum(discStripArea(rail.PostOD, W/2, y0, y1) * min(h, maxHi)
+                   for y0, y1, h in strips if h > 0)
+        vol -= rail.nPosts * over
+    return vol + capArea*T
+#--------------------------------------------------
+def bridgesVolume(rail, tapes, span):
+    '''Return volume, in mm^3, of the parts of the bridges made by
+    makeBridges(rail, span) that are not within caps of the units
+    made for list of tapes.  (Bridges lie in the cap layer, so only
+    their parts across channel gaps and cutouts add volume.)'''
+    n, BW, T = rail.Bridges, rail.BridgeWide, rail.CapThik
+    if n <= 0 or BW <= 0 or span <= 0: return 0
+    step = (rail.CapLen-2*rail.BridgeOffset)/max(1,n-1)
+    cuts = 'L' in rail.Output or 'R' in rail.Output
+    cutLen = rail.CapLen - 2*rail.EndLen
+    area = 0
+    for k in range(n):
+        x0 = rail.BridgeOffset + k*step - BW/2
+        under = 0               # Plan area of caps under this bridge
+        for tA, tB in zip(tapes, tapes[1:]):
+            under += rail.CapWide * BW
+            if cuts:
+                under -= cutWidthIntegral(x0, x0+BW, rail.EndLen, cutLen, tA.oho-tA.ohoa)
+                under -= cutWidthIntegral(x0, x0+BW, rail.EndLen, cutLen, tB.oh1-tB.oh1a)
+        area += span*BW - under
+    return area * T
+#--------------------------------------------------
+def assemblyVolumes(rail, tapes, maxHi, span):
+    '''Return list of unit volumes, and bridges volume, in mm^3, for
+    the assembly that produceOutput makes'''
+    vols = [unitVolume(rail, tA, tB, maxHi) for tA, tB in zip(tapes, tapes[1:])]
+    return vols, bridgesVolume(rail, tapes, span)
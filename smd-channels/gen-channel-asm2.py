@@ -12,9 +12,33 @@
 # (c) In openscad, press F6 to render details, then Export, as STL.
 # (d) Say `craftware $STF &` then slice it and save gcode
 
-from solid import cube, cylinder, hole, part, scad_render_to_file, scale, translate
+# Params are keyword=value forms, in any order:
+#   specs=         Spec library: an .xml file with a Tape Data table
+#                  (eg smd-channels3.xml) or a .csv file with columns
+#                  name, wide, high, oh1, oho, and optionally nick.
+#                  Empty means use the built-in makeChannelSpecs set.
+#   chans=Resistor,Resistor,SS14,TSOP16   Channel names (or nicknames)
+#                  in order; name*k means k channels of that name
+#   out=channel-asm2.scad   Output file
+# (Params can also come from GEN_CHANNEL_ASM2_<name> environment
+# variables; see runConfig.py.)  Spec rows that leave out wide, high,
+# oh1, or oho get that column's default: its val in the .xml table's
+# columnData, else the value in specDefaults.
+#
+# Each distinct rail is built once (see railCache) and written as an
+# OpenSCAD module, so a bank of 200 channels costs about as much to
+# make as a bank of its distinct tape types.
+
+import csv, os, sys
+from itertools import accumulate
+from xml.etree import ElementTree
+from solid import cube, cylinder, hole, part, scad_render_to_file, scale, translate, union
+from solid.solidpython import OpenSCADObject
 from solid.screw_thread import thread, default_thread_section
 from solid.utils import up, down, left, right, forward, back
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scadParts import scadModules # (from parent directory)
+from runConfig import ConfigSchema
 
 # Specs-holder for channel height, width, and overhang
 class ChannelSpec:
@@ -85,39 +109,93 @@ def makeChannelSpecs():
         'tantCap':  ChannelSpec(12,   3.5,   3.3,   0.8),  
         'inductor': ChannelSpec(16,   6,     3.8,   0.8) }
 
+specDefaults = dict(wide='0', high='0', oh1='0', oho='0')
+
+def loadChannelSpecs(fiName):
+    '''Return dict of ChannelSpecs from the Tape Data table of .xml
+    file fiName, or from .csv file fiName, indexed by tape name and by
+    nickname.  Names take precedence over nicknames.'''
+    defaults = dict(specDefaults)
+    if fiName.endswith('.csv'):
+        with open(fiName, newline='') as fi:
+            rows = list(csv.DictReader(fi, skipinitialspace=True))
+    else:
+        rows = []
+        for tab in ElementTree.parse(fiName).getroot().findall('table'):
+            if tab.attrib.get('cue') == 'tapes':
+                for col in tab.iter('column'):
+                    if col.attrib.get('cue') in defaults:
+                        defaults[col.attrib['cue']] = col.attrib.get('val') or defaults[col.attrib['cue']]
+                rows += [row.attrib for row in tab.findall('row')]
+    specs, nicks = {}, {}
+    for row in rows:
+        spec = ChannelSpec(*[float(row.get(k) or defaults[k]) for k in ('wide', 'high', 'oh1', 'oho')])
+        specs[row['name']] = spec
+        if row.get('nick'):
+            nicks[row['nick']] = spec
+    nicks.update(specs)
+    return nicks
+
 def makeModelRail(railLen, nPosts, pillar1, pillarSep):
     PillarOD, PillarID = 0.21, 0.11
     LegThik, CapThik, CapWide, eps = 0.05, 0.05, 0.75, 2e-4
     return RailModel(railLen, nPosts, pillar1, pillarSep, PillarOD, PillarID, LegThik, CapThik, CapWide, eps)
 
-def makeChannels(railModel, chanNames):
-    asm = None
-    for cname in chanNames:
-        crail = ChannelRail(railModel, channelSpecs[cname])
-        c = crail.makeRail()
-        asm = (c + forward(railModel.CapWide+.1)(asm)) if asm else c
-    return asm
+railCache = {}      # rail key: (module name, rail), of rails made
+
+def cachedRail(railModel, spec):
+    '''Return name of module for the rail of railModel and spec, making
+    the rail if that combination hasn't been seen before'''
+    crail = ChannelRail(railModel, spec)
+    key = tuple(sorted(vars(crail).items()))
+    if key not in railCache:
+        railCache[key] = ('rail{}'.format(len(railCache)), crail.makeRail())
+    return railCache[key][0]
 
-def makeCrossbar(railModel, chanNames, barThik, barWidth, nBars):
+def railModules():
+    '''Return SCAD text that defines a module for each cached rail'''
+    return scadModules(railCache.values())
+
+def makeChannels(railModel, chanNames, specs=None):
+    specs = specs or channelSpecs
+    step, last = railModel.CapWide+.1, len(chanNames)-1
+    return union()([forward((last-k)*step)(OpenSCADObject(cachedRail(railModel, specs[cname]), {}))
+                    for k, cname in enumerate(chanNames)])
+
+def makeCrossbar(railModel, chanNames, barThik, barWidth, nBars, specs=None):
+    specs = specs or channelSpecs
     eps   = railModel.eps
     capW  = railModel.CapWide
     holeD = railModel.PillarID
-    specs = [channelSpecs[cname] for cname in chanNames]
-    skips = [spec.ChanWide - spec.ChanHang1 - spec.ChanHang2 for spec in specs]
-    barLen = sum([capW + skip for skip in skips])
-    bar = cube([barWidth, barLen, barThik])
-    holeAt = capW/2
-    for skip in skips:
-        bar += hole()(translate([barWidth/2,holeAt,-eps])(cylinder(d=holeD, h=barThik+2*eps)))
-        holeAt += capW + skip
-    asm = None
-    for line in range(nBars):
-        asm = left(barWidth+.1)(bar + asm if asm else bar)
-    return asm
+    gaps  = [capW + specs[cname].ChanWide - specs[cname].ChanHang1 - specs[cname].ChanHang2
+             for cname in chanNames]
+    barLen = sum(gaps)
+    holeAts = accumulate([capW/2] + gaps[:-1])
+    bar = union()(cube([barWidth, barLen, barThik]),
+                  [hole()(translate([barWidth/2,holeAt,-eps])(cylinder(d=holeD, h=barThik+2*eps)))
+                   for holeAt in holeAts])
+    return union()([left(line*(barWidth+.1))(bar) for line in range(1, nBars+1)])
+
 
+def chanList(chans):
+    '''Return list of channel names from a comma-separated list whose
+    entries are names or name*count forms'''
+    names = []
+    for entry in chans.split(','):
+        name, _, count = entry.partition('*')
+        names += [name.strip()] * int(count or 1)
+    return names
 
 if __name__ == '__main__':
-    channelSpecs = makeChannelSpecs()
+    schema = ConfigSchema('gen-channel-asm2', dict(specs='', chans='Resistor,Resistor,SS14,TSOP16', out=''))
+    par, flubs = schema.resolve(schema.environ(), sys.argv[1:])
+    if flubs:
+        sys.exit('Parameter-setting fail: {}; params are {}'.format(flubs, ' '.join(schema.defaults)))
+    channelSpecs = loadChannelSpecs(par.specs) if par.specs else makeChannelSpecs()
+    chanNames = chanList(par.chans)
+    unknown = sorted(set(chanNames) - set(channelSpecs))
+    if unknown:
+        sys.exit('No channel specs for: {}'.format(', '.join(unknown)))
     railLen = 1.0
     nPosts = 2
     postSep = railLen/nPosts
@@ -125,13 +203,11 @@ if __name__ == '__main__':
     modelRail = makeModelRail(railLen, nPosts, post1x, postSep)
     sf = 25.4
     barThik, barWidth, nBars = 0.06, 0.4, nPosts
-    chanNames = ['Resistor','Resistor', 'SS14','SS14', 'TSOP16','TSOP16', 'inductor']
-    chanNames = ['Resistor', 'Resistor', 'SS14', 'TSOP16']
     asm  = scale((sf, sf, sf))(makeChannels(modelRail, chanNames))
     asm += scale((sf, sf, sf))(makeCrossbar(modelRail, chanNames, barThik, barWidth, nBars))
     cylSegments, version = 60, 2
-    cylSet_fn = '$fn = {};'.format(cylSegments)
-    asmFile = 'channel-asm{}.scad'.format(version)
+    cylSet_fn = '$fn = {};'.format(cylSegments) + railModules()
+    asmFile = par.out or 'channel-asm{}.scad'.format(version)
     scad_render_to_file(asm, asmFile, file_header=cylSet_fn, include_orig_code=False)
     print ('Wrote scad code to {}'.format(asmFile))
 
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+# Module to load tables from a .xml file (as loadTablesForXML does)
+# into plain python objects instead of Qt widgets, for use by batch
+# and benchmark code that runs without a display.
+
+# A HeadlessTable provides the parts of the QTableWidget interface that
+# ChannelVars accessors and smd-channelsProduce use: rowCount(),
+# item(ro,co).text() and .setText(), plus .tabN, .tabName, .tabCue,
+# .radioRo, .radioCo, and .mains.  loadHeadless() returns an object
+# with tab1, tab2, ... attributes, like the `mains` of the Qt app.
+# tablesSnapshot() copies cell texts of Qt or headless tables into
+# plain lists, which can be pickled (eg to send to worker processes),
+# and mainsFromSnapshot() makes a HeadlessMains from such a snapshot.
+
+# colProcess and tableRows are also used by loadTablesForXML, so that
+# both load tables from .xml the same way.  tableRows gets cell texts
+# of all rows of a table in one pass, via the decodeRows method that
+# make-xml-accessors generates for each ChannelVars table class, and
+# reports unknown keys and non-numeric values together.  (Typed values
+# come from each table class's values() method, when needed.)
+
+import re
+from xml.etree import ElementTree
+from ChannelVars import Table1, tableClasses
+#---------------------------------------------
+def colProcess(top):
+    '''Return colCues, colNames, colFmts, colVals, colTips lists for
+    the column entries in a columnData element'''
+    cols = []
+    for col in top:
+        atts = [col.attrib.get(x,None) for x in ['col', 'cue', 'name', 'fmt', 'val', 'tip']]
+        atts[-1] = re.sub(' +', ' ', atts[-1]) # tip
+        cols.append(atts)
+
+    cols = sorted(cols)
+    # Return: colCues, colNames, colFmts, colVals, colTips
+    return ([e[i] for e in cols] for i in range(1,6))
+#---------------------------------------------
+def rowValues(tabN, top, colNums, colVals):
+    '''Return list of cell strings for a row element: defaults from
+    colVals, replaced by values of the row's attributes'''
+    rowdat = [v for v in colVals] # Copy default values
+    attr = top.attrib
+    for key in attr.keys():
+        if key in colNums:
+            rowdat[colNums[key]] = attr[key]
+        else:
+            print ('\n\tKey `{}` mistake?  Head keys are {}\n\tand row data is {}\n'.format(key, sorted(colNums.keys()),attr))
+    # If 'nick' isn't set (is blank or None), copy name to nick.
+    if tabN == '1':
+        colName, colNick = Table1.colName(), Table1.colNick()
+        if not rowdat[colNick]:  rowdat[colNick] = rowdat[colName]
+    return rowdat
+#---------------------------------------------
+def tableRows(tabN, rowElts, colNums, colVals):
+    '''Return lists of cell strings for list rowElts of row elements of
+    table tabN, as rowValues would, and print any problems found'''
+    tClass = tableClasses().get(tabN)
+    if tClass is None:          # No accessors for table; do it per row
+        return [rowValues(tabN, elt, colNums, colVals) for elt in rowElts]
+    texts, bad = tClass.decodeRows([elt.attrib for elt in rowElts])
+    if bad:
+        print ('\n\tTable {} key or value mistakes?  Head keys are {}'.format(tabN, sorted(colNums.keys())))
+        for ro, key, txt, why in bad:
+            print ('\t  row {}: {} `{}`, value `{}`'.format(ro, why, key, txt))
+        print ()
+    if tabN == '1':             # Copy blank nicks from names
+        colName, colNick = Table1.colName(), Table1.colNick()
+        for rowdat in texts:
+            if not rowdat[colNick]:  rowdat[colNick] = rowdat[colName]
+    return texts
+#---------------------------------------------
+class HeadlessItem:
+    '''Holds the text of one table cell'''
+    def __init__(self, txt):    self.txt = txt
+    def text(self):             return self.txt
+    def setText(self, txt):     self.txt = txt
+#---------------------------------------------
+class HeadlessTable:
+    '''Holds rows of HeadlessItems for one table'''
+    def __init__(self, mains, tabN, tabName, tabCue, colCues, colFmts):
+        self.mains, self.tabN, self.tabName, self.tabCue = mains, tabN, tabName, tabCue
+        self.colCues, self.colFmts = colCues, colFmts
+        self.rows, self.radioRo, self.radioCo = [], -1, -1
+    def rowCount(self):         return len(self.rows)
+    def columnCount(self):      return len(self.colCues)
+    def item(self, ro, co):     return self.rows[ro][co]
+    def addRow(self, rowdat):
+        '''Append a row of cell strings; a radio-button cell that has
+        text marks its row as the selected row'''
+        ro = len(self.rows)
+        for co, txt in enumerate(rowdat):
+            if self.colFmts[co]=='r' and txt:
+                self.radioRo, self.radioCo = ro, co
+        self.rows.append([HeadlessItem(txt) for txt in rowdat])
+#---------------------------------------------
+class HeadlessMains:
+    '''Top level of headless data structure; has tab1, tab2, ...'''
+    def __init__(self):
+        self.tab1 = self.tab2 = self.tab3 = self.tab4 = self.tab5 = None
+#---------------------------------------------
+def makeTables(mains, etree):
+    '''Make HeadlessTables per tables in XML tree etree'''
+    for kid in etree.getroot():
+        tabN = kid.attrib.get('tab', None)
+        if kid.tag != 'table' or tabN == None:
+            continue
+        tab = None
+        for elt in kid:
+            if elt.tag=='columnData':
+                colCues, colNames, colFmts, colVals, colTips = colProcess(elt)
+                tab = HeadlessTable(mains, tabN, kid.attrib.get('name', '?'),
+                                    kid.attrib.get('cue', '?'), colCues, colFmts)
+                colOrder = {t: k for k, t in enumerate(colCues)}
+        if tab==None:
+            print ('Table {} not specified'.format(tabN))
+            continue
+        setattr(mains, 'tab'+tabN, tab)
+        rowElts = [elt for elt in kid if elt.tag=='row']
+        for rowdat in tableRows(tabN, rowElts, colOrder, colVals):
+            tab.addRow(rowdat)
+#---------------------------------------------
+def tablesSnapshot(mains, tabNs='123'):
+    '''Return dict of tabN: (tabName, tabCue, colCues, colFmts, rows)
+    for tables tabNs of mains (Qt or headless), where rows are lists of
+    cell texts and the marked radio-button cell has text *'''
+    snap = {}
+    for tabN in tabNs:
+        tab, tClass = getattr(mains, 'tab'+tabN), tableClasses()[tabN]
+        fmts, rows = tClass.colFmts(), []
+        for ro in range(tab.rowCount()):
+            rows.append([('*' if (ro, co)==(tab.radioRo, tab.radioCo) else '')
+                         if f=='r' else tab.item(ro, co).text() for co, f in enumerate(fmts)])
+        snap[tabN] = (tab.tabName, tab.tabCue, tClass.colCues(), fmts, rows)
+    return snap
+#---------------------------------------------
+def mainsFromSnapshot(snap):
+    '''Return a HeadlessMains with tables made from snapshot snap'''
+    mains = HeadlessMains()
+    for tabN, (tabName, tabCue, colCues, colFmts, rows) in snap.items():
+        tab = HeadlessTable(mains, tabN, tabName, tabCue, colCues, colFmts)
+        for rowdat in rows:
+            tab.addRow(list(rowdat))
+        setattr(mains, 'tab'+tabN, tab)
+    return mains
+#---------------------------------------------
+def loadHeadless(specsFile):
+    '''Load tables from .xml file specsFile; return a HeadlessMains'''
+    mains = HeadlessMains()
+    makeTables(mains, ElementTree.parse(specsFile))
+    return mains
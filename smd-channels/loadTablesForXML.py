@@ -13,6 +13,8 @@
 
 # Program make-xml-accessors.py makes a variables-accessor module
 # `ChannelVars`, [or use whatever other module name is preferred].
+# When this module is imported, ChannelVars gets regenerated if its
+# schema hash doesn't match the .xml file's tables (see accessorCache).
 # Each cell V in a row of the displayed tables has corresponding colV,
 # getV and putV methods defined in ChannelVars.py.
 
@@ -34,7 +36,9 @@
 # module, your own code can add or remove other application-specific
 # .connect() routines as necessary.
 
-import re, sys
+import sys
+from accessorCache     import refreshAccessors, specsFileArg
+refreshAccessors(specsFileArg(sys.argv)) # Regenerate ChannelVars if schema changed
 from ChannelVars       import Table1, Table2, Table3
 from ChannelCallbacks  import CallData
 from PyQt5             import QtWidgets
@@ -44,24 +48,13 @@ from PyQt5.QtWidgets import QSplitter, QTableWidget, QTableWidgetItem
 from PyQt5.QtWidgets import QApplication, QPushButton, QWidget, QHeaderView
 from PyQt5.QtWidgets import QRadioButton
 from xml.etree import ElementTree
+from headlessTables    import colProcess, tableRows
 #---------------------------------------------
 def ErrorExit(msg, fname):
     sys.stderr.write('\n*** {} {} ***\n'.format(msg, fname))
     sys.exit(0)
 #---------------------------------------------
-def rowProcess(mains, tab, top, colNums, colFmts, colVals):
-    rowdat = [v for v in colVals] # Copy default values
-    attr = top.attrib
-    colName, colNick = Table1.colName(), Table1.colNick()    
-    for key in attr.keys():
-        try:
-            co = colNums[key]
-            rowdat[co] = attr[key]
-        except:
-            print ('\n\tKey `{}` mistake?  Head keys are {}\n\tand row data is {}\n'.format(key, sorted(colNums.keys()),attr))
-    # If 'nick' isn't set (is blank or None), copy name to nick.
-    if tab.tabN == '1':
-        if not rowdat[colNick]:  rowdat[colNick] = rowdat[colName]
+def rowProcess(mains, tab, rowdat, colFmts):
     # Insert next row into display structure
     ro = tab.rowCount();  tab.insertRow(ro)
     # Copy items from rowdat into new row
@@ -78,17 +71,6 @@ def rowProcess(mains, tab, top, colNums, colFmts, colVals):
         else:
             tab.setItem(ro, co, QTableWidgetItem(txt))
 #---------------------------------------------
-def colProcess(tab, top):
-    cols = []
-    for col in top:
-        atts = [col.attrib.get(x,None) for x in ['col', 'cue', 'name', 'fmt', 'val', 'tip']]
-        atts[-1] = re.sub(' +', ' ', atts[-1]) # tip
-        cols.append(atts)
-
-    cols = sorted(cols)
-    # Return: colCues, colNames, colFmts, colVals, colTips
-    return ([e[i] for e in cols] for i in range(1,6))
-#---------------------------------------------
 def makeTable(mains, tabN, tbase):
     #print ('Making table {}'.format(tabN))
     styleBlob, rowSet, tWide, tHi, tName, tCue = '', [], 100, 100, '?', '?'
@@ -102,7 +84,7 @@ def makeTable(mains, tabN, tbase):
     tab = None
     for elt in tbase:
         if elt.tag=='columnData':
-            colCues, colNames, colFmts, colVals, colTips = colProcess(tab, elt)
+            colCues, colNames, colFmts, colVals, colTips = colProcess(elt)
             tab = QTableWidget(0, len(colNames), mains)
             tab.tabN = tabN
             tab.setHorizontalHeaderLabels(colNames)
@@ -130,10 +112,11 @@ def makeTable(mains, tabN, tbase):
     elif tabN=='4':  mains.tab4 = tab
     elif tabN=='5':  mains.tab5 = tab
 
+    rowElts = [elt for elt in tbase if elt.tag=='row']
+    for rowdat in tableRows(tabN, rowElts, colOrder, colVals):
+        rowSet.append(rowProcess(mains, tab, rowdat, colFmts))
     for elt in tbase:
-        if elt.tag=='row':
-            rowSet.append(rowProcess(mains, tab, elt, colOrder, colFmts, colVals))
-        elif elt.tag=='style':
+        if elt.tag=='style':
             styleBlob += elt.attrib.get('part',None)
     if styleBlob:
         tab.setStyleSheet(styleBlob)
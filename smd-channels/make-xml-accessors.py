@@ -9,8 +9,20 @@
 # methods for each class, like getV(), putV(), colV(), for each V in
 # the set of variables (columns) in table.
 
+# Each class also gets a row decoder, decodeRows(), compiled from the
+# column specs: it maps a list of row-attribute dicts to cell texts
+# (with column defaults filled in), checking numeric cells in one pass
+# per row, and collects unknown keys and unconvertible numbers into
+# one list instead of failing or printing per cell.  And each class
+# gets values(), which returns its row's current cells as a Row tuple
+# of typed values, converted in one pass, for code that reads many
+# columns of a row (eg TapeData and RailData in smd-channelsProduce).
+# Cells are read at each call, so values() sees edits made in the Qt
+# tables.
+
 from xml.etree import ElementTree
 from time import ctime
+from accessorCache import schemaHash
 import sys
 #---------------------------------------------
 def ErrorExit(msg, fname):
@@ -24,13 +36,15 @@ def colProcess(tabCue, tabNum, tabName, top, modo):
         cue = colEntry.attrib.get('cue', None)
         fmt = colEntry.attrib.get('fmt',None)
         nam = colEntry.attrib.get('name',None)
+        val = colEntry.attrib.get('val','')
         cid = cue[0].upper() + cue[1:] # Upper-case the first character of id
-        colData.append((col,cid,cue,fmt,nam))
+        colData.append((col,cid,cue,fmt,nam,val))
     colData = sorted(colData)
     colCids  = [e[1] for e in colData]
     colCues  = [e[2] for e in colData]
     colFmts  = [e[3] for e in colData]
     colNames = [e[4] for e in colData]
+    colVals  = [e[5] for e in colData]
 
     modo.write('\nclass Table{}:  # Class: Accessors for a row of tab{} / {} / {}\n'.format(tabNum, tabNum, tabCue, tabName))
     modo.write('    def __init__(self,tab,ro):  self.tab, self.ro = tab, ro\n')
@@ -69,12 +83,56 @@ def colProcess(tabCue, tabNum, tabName, top, modo):
         else:
             modo.write('\n    @staticmethod          #    Column #   Format     Id           Column-name \n')
         modo.write('    def col{}():{:{wide}}return {:2}   #      {}     {:<14} {}\n'.format(i, '', k, fmt, i, colNames[k], wide=max(1,13-len(i))))
+    decoderProcess(tabNum, colCids, colCues, colFmts, colVals, modo)
+
+def decoderProcess(tabNum, colCids, colCues, colFmts, colVals, modo):
+    '''Write column-index map, defaults, Row tuple type, row values
+    method, and row decoder for class Table{tabNum}'''
+    tc = 'Table{}'.format(tabNum)
+    conv = {'f':'float({})', 'i':'int({})'}
+    modo.write('\n    @staticmethod\n')
+    modo.write('    def colIndex():             return {}\n'.format({c: k for k, c in enumerate(colCues)}))
+    modo.write('    @staticmethod\n')
+    modo.write('    def colDefaults():          return {}\n'.format(colVals))
+    modo.write("    Row = namedtuple('{}Row', {})\n".format(tc, colCids))
+    item = 'item = self.tab.item'
+    cells = ', '.join('item(ro,{}).text()'.format(k) for k in range(len(colCues)))
+    modo.write('    def values(self):\n')
+    modo.write("        '''Return a Row of this row's cells, typed as getters type them'''\n")
+    modo.write('        ro, {} = self.ro, {}\n'.format(*item.split(' = ')))
+    if any(f in conv for f in colFmts):
+        modo.write('        return {}.Row(*xml_cells(ro, [{}], {}.colCues(), {}.colFmts(), []))\n'.format(tc, cells, tc, tc))
+    else:
+        modo.write('        return {}.Row({})\n'.format(tc, cells))
+    modo.write('    @staticmethod\n')
+    modo.write('    def decodeRows(rows):\n')
+    modo.write("        '''Return (texts, bad) for rows, a list of row-attribute dicts:\n")
+    modo.write('        lists of cell texts, with defaults for missing cells; and\n')
+    modo.write('        (row#, key, text, problem) for each unknown key or\n')
+    modo.write("        unconvertible number'''\n")
+    modo.write('        texts, bad = [], []\n')
+    modo.write('        known = {}.colIndex().keys()\n'.format(tc))
+    modo.write('        for ro, a in enumerate(rows):\n')
+    modo.write('            g = a.get\n')
+    modo.write('            t = [{}]\n'.format(', '.join('g({!r}, {!r})'.format(c, v) for c, v in zip(colCues, colVals))))
+    nums = [conv[f].format('t[{}]'.format(k)) for k, f in enumerate(colFmts) if f in conv]
+    if nums:
+        modo.write('            try:\n')
+        modo.write('                {}\n'.format(', '.join(nums)))
+        modo.write('            except ValueError:\n')
+        modo.write('                xml_cells(ro, t, {0}.colCues(), {0}.colFmts(), bad)\n'.format(tc))
+    modo.write('            if not a.keys() <= known:\n')
+    modo.write("                bad += [(ro, k, a[k], 'unknown key') for k in a if k not in known]\n")
+    modo.write('            texts.append(t)\n')
+    modo.write('        return texts, bad\n')
 
 # Make module per columnData from XML tree
 def makeModule(xmlFi, modFi, modo, etree):
     modo.write('# Module:  {}\n'.format(modFi))
     modo.write('# Get/Put variables for .xml file {}\n'.format(xmlFi))
     modo.write('# Generated {} by {}\n'.format(ctime(), __file__))
+    modo.write('# Schema hash: {}\n'.format(schemaHash(etree)))
+    modo.write('from collections import namedtuple\n')
     modo.write('def xml_float(s):\n')
     modo.write('    try:\n')
     modo.write('        return float(s)\n')
@@ -85,6 +143,17 @@ def makeModule(xmlFi, modFi, modo, etree):
     modo.write('        return int(s)\n')
     modo.write('    except ValueError:\n')
     modo.write('        return -1\n')
+    modo.write('def xml_cells(ro, texts, cues, fmts, bad):\n')
+    modo.write("    '''Return texts converted per fmts, as xml_float and xml_int do;\n")
+    modo.write("    add (ro, cue, text, problem) to bad for each that fails'''\n")
+    modo.write('    cells = []\n')
+    modo.write('    for txt, cue, fmt in zip(texts, cues, fmts):\n')
+    modo.write('        try:\n')
+    modo.write("            cells.append(float(txt) if fmt=='f' else int(txt) if fmt=='i' else txt)\n")
+    modo.write('        except ValueError:\n')
+    modo.write("            cells.append(-1. if fmt=='f' else -1)\n")
+    modo.write("            bad.append((ro, cue, txt, 'not a number'))\n")
+    modo.write('    return cells\n')
 
     tabCues, tabNums, tabNames = [], [], []
     for kid in etree.getroot():
@@ -103,6 +172,8 @@ def makeModule(xmlFi, modFi, modo, etree):
     modo.write(  'def tableCues():        return {}\n'.format(tabCues))
     modo.write(  'def tableNums():        return {}\n'.format(tabNums))
     modo.write(  'def tableNames():       return {}\n'.format(tabNames))
+    modo.write(  'def schemaHash():       return {!r}\n'.format(schemaHash(etree)))
+    modo.write(  'def tableClasses():     return {{{}}}\n'.format(', '.join("'{0}': Table{0}".format(n) for n in tabNums)))
 
 def loadXMLData(specsFile):
     try:                            # Read script from file and parse it
@@ -4,15 +4,52 @@
 # SMD-tape channels, for pick-and-place operations -- with specs
 # picked up from QtTableWidget application
 
+# With a --profile or --profile=X.json program arg, each volumes
+# update and each Produce prints a one-line summary of stage times,
+# counts, and peak memory; with X.json given, also writes JSON to X.
+
+# SolidPython and PyQt5 are imported where first used, not here, so
+# volume calculations and headless use don't pay for loading them.
+# With a --startup-profile program arg, each Produce prints import
+# times, including those of imports done on first use.
+
+# Each distinct unit -- distinct per (rail, tapeA, tapeB, maxHi) -- is
+# made once and kept in unitCache, and gets written once, as SCAD
+# module unitK() plus module unitKHoles() for its post holes; the
+# assembly places calls of those modules.  (Holes are placed as
+# SolidPython holes, so they still cut through bridges, as before.)
+
+# BatchProd (or a --batch or --batch=0,3,... program arg, which runs
+# without Qt) writes channel-asm{version}-{label}.scad for each rail
+# row of table 2 -- the selected rows, or all rows if none are
+# selected -- using the same tape list for each.  Rails are done in
+# parallel worker processes, each working from a snapshot of the
+# tables, and a line with each job's time gets printed.
+
+# With a --preview or --preview=k program arg, each Produce (and
+# batch Produce) also writes a low-detail copy of its output, eg
+# channel-asm4-preview.scad, with cylinders of k sides (default 8),
+# so OpenSCAD previews of long rails stay responsive.
+
+import sys, os, re
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stageProfile import StageProfile, countNodes, profileFlag, startupFlag
+from scadParts import scadModule, writeSplitScad # (from parent directory)
 from math import sqrt
-from PyQt5.QtCore import Qt
-from solid import color, cube, cylinder, rotate
-from solid import hole, part, scad_render_to_file, scale, translate
-from solid.utils import up, down, left, right, forward, back
-from solid.utils import Cyan, Green, Red, Magenta
+from accessorCache import refreshAccessors, specsFileArg
+refreshAccessors(specsFileArg(sys.argv)) # (Before ChannelVars is imported)
 from ChannelVars import Table1, Table2, Table3 # tape-types, rail-specs, units-to-do
 from ChannelCallbacks import CallData
-from loadTablesForXML import loadAndShow
+from headlessTables import tablesSnapshot, mainsFromSnapshot
+from channelVolumes import unitVolume, assemblyVolumes, massGrams
+profiling, profileJSON = False, '' # Set by --profile arg
+unitCache = {}                  # unitKey: (unit, holes) of units made
+startup = None                  # Set by --startup-profile arg
+preview = 0                     # Preview cylinder sides, set by --preview arg
+version = 4                     # Output goes to channel-asm{version}.scad
 #--------------------------------------------------
 class RailData:                 # Specs for channel-rail
     def __init__(self, mains, eps):
@@ -28,22 +65,22 @@ class RailData:                 # Specs for channel-rail
         self.railOk = False
         if ro < 0:
             return
-        rtab = Table2(tab,ro)
-        self.CapLen      = rtab.getCapLen()
-        self.nPosts      = rtab.getPosts()
-        self.PostOffset  = rtab.getPostOffset()
-        self.PostID      = rtab.getPostID()
-        self.PostOD      = rtab.getPostOD()
-        self.LegThik     = rtab.getLegThik()
-        self.CapThik     = rtab.getCapThik()
-        self.CapWide     = rtab.getCapWide()
-        self.EndLen      = rtab.getEndLen()
-        self.PadLen      = rtab.getPadLen()
-        self.Slack       = rtab.getSlack()
-        self.Bridges     = rtab.getBridges()
-        self.BridgeOffset= rtab.getBridgeOffset()
-        self.BridgeWide  = rtab.getBridgeWide()
-        self.Output      = rtab.getOutput()
+        rv = Table2(tab,ro).values() # Typed cells of row, in one pass
+        self.CapLen      = rv.CapLen
+        self.nPosts      = rv.Posts
+        self.PostOffset  = rv.PostOffset
+        self.PostID      = rv.PostID
+        self.PostOD      = rv.PostOD
+        self.LegThik     = rv.LegThik
+        self.CapThik     = rv.CapThik
+        self.CapWide     = rv.CapWide
+        self.EndLen      = rv.EndLen
+        self.PadLen      = rv.PadLen
+        self.Slack       = rv.Slack
+        self.Bridges     = rv.Bridges
+        self.BridgeOffset= rv.BridgeOffset
+        self.BridgeWide  = rv.BridgeWide
+        self.Output      = rv.Output
         self.eps         = eps
         self.railOk = True
         #self.      = rtab.get()
@@ -63,15 +100,16 @@ class TapeData:                 # Specs for one tape-type
         for ro in range(tab.rowCount()):
             if tab.item(ro,coN).text()==ttype or tab.item(ro,coK).text()==ttype:
                 trow = Table1(tab,ro)
+                tv = trow.values() # Typed cells of row, in one pass
                 self.ro   = ro
                 self.rof  = rofrom
                 self.tab  = trow
-                self.wide = trow.getWide()
-                self.high = trow.getHigh()
-                self.oh1  = trow.getOh1()
-                self.oho  = trow.getOho()
-                self.oh1a  = trow.getOh1a()
-                self.ohoa  = trow.getOhoa()
+                self.wide = tv.Wide
+                self.high = tv.High
+                self.oh1  = tv.Oh1
+                self.oho  = tv.Oho
+                self.oh1a  = tv.Oh1a
+                self.ohoa  = tv.Ohoa
                 self.tapeOk = True
                 return
         # Raise an exception if tape type wasn't found.
@@ -103,38 +141,36 @@ def calcVols(mains):
     except:  # Can't calc before tables are built
         return
     # Find selected specification (the marked row in table 2)
-    tab1, tab2, tab3 = mains.tab1, mains.tab2, mains.tab3
+    tab2, tab3 = mains.tab2, mains.tab3
     if tab2.radioRo < 0:
         print ('Problem:  No Marked Row Found in Table 2')
         return
-    s2 = Table2(tab2, tab2.radioRo)
+    prof = StageProfile('smd-channelsProduce calcVols')
     nro  = tab3.rowCount()
     vols = ['']*nro
-    tapes = getTapeDataList(mains)
+    with prof.stage('tapes'):
+        rail  = RailData(mains, 0)
+        tapes = getTapeDataList(mains)
     if not tapes: return
-    sl = tapes[0]               # Get first-row accessors
-    for sr in tapes[1:]:        # Get next-row accessors
-        legHi = max(sl.high, sr.high)
-        caplen = s2.getCapLen()
-        # Approx cap volume: rounded corners not accounted for,
-        # maybe ok, but not ok is setback not accounted for
-        CapVol = max(0, s2.getCapWide() * caplen * s2.getCapThik())
-        # Approx 2-legs volume: half-rounds at ends not accounted for.
-        LegVol = max(0, 2 * (caplen - 2*s2.getPadLen()) * legHi * s2.getLegThik())
-        # Approx volume of posts & bridges:  bridges not included.
-        postArea = 3.14 * (s2.getPostOD()**2 - s2.getPostID()**2)/4.
-        PilVol = max(0, s2.getPosts() * legHi * postArea)
-        # Compute total approx volume, converting mm^3 to mL
-        evol = '{:1.2f}'.format((CapVol+LegVol+PilVol)/1000) # 1000 mm^3 per mL
-        # Put computed value in list
-        vols[sr.rof] = evol
-        sl = sr
+    with prof.stage('volumes'):
+        # Unit volumes, exact apart from eps overlaps; see channelVolumes
+        maxHi = unitSpan(rail, tapes)[0]
+        sl = tapes[0]               # Get first-row accessors
+        for sr in tapes[1:]:        # Get next-row accessors
+            evol = unitVolume(rail, sl, sr, maxHi)
+            vols[sr.rof] = '{:1.2f}'.format(evol/1000) # 1000 mm^3 per mL
+            sl = sr
     # Push computed values into table
     vols[0] = '(ml)'
     for ro in range(nro):
         Table3(tab3, ro).putVolRO(vols[ro])
+    if profiling:
+        prof.count('units', len(tapes)-1)
+        prof.report(profileJSON)
 #--------------------------------------------------
 def makeBridges(rail, span):
+    from solid import color, cube
+    from solid.utils import back, right, Cyan
     BridgeN      = rail.Bridges
     BridgeOffset = rail.BridgeOffset
     BridgeWide   = rail.BridgeWide
@@ -148,13 +184,20 @@ def makeBridges(rail, span):
         asm = b + asm if asm else b
     return color(Cyan)(asm) if asm else None
 #--------------------------------------------------
-def makeTube(idi, odi, hi, transl, half, eps):
+def makeTube(idi, odi, hi, transl, half, eps, holes=None):
     '''Make a tube or half-tube.  idi, odi = inner and outer diameters;
     hi= height; transl = [x,y,z] translation vector; half = whole or
-    half indicator: -1=right half, 0=whole, +1=left half.
+    half indicator: -1=right half, 0=whole, +1=left half.  If list
+    holes is given, the tube's hole goes into it instead of the tube.
     '''
+    from solid import cube, cylinder, hole, translate
+    from solid.utils import down
     loss = cylinder(d=idi, h=hi+2*eps)
-    tube = cylinder(d=odi, h=hi) - hole()(down(eps)(loss))
+    if holes is None:
+        tube = cylinder(d=odi, h=hi) - hole()(down(eps)(loss))
+    else:
+        tube = cylinder(d=odi, h=hi)
+        holes.append(translate(transl)(down(eps)(loss)))
     if half:
         block = cube([odi/2, odi+2*eps, hi+2*eps])
         dx = -(odi+eps)/2 if half < 0 else 0
@@ -168,6 +211,8 @@ def rampBar(leng, wide, high, transl):
     sizes.  transl = 3-vector with x,y,z distances to translate the
     origin-corner of the bar.
     '''
+    from solid import cube, rotate, translate
+    from solid.utils import back, right
     s2 = sqrt(2)
     cu = cube([leng, wide, high])
     box = rotate(a=[0,-45,0])(back(wide)((cube([s2*high, 3*wide, s2*high]))))
@@ -179,6 +224,7 @@ def rampSide(leng, wide, high, transl, rotat):
     rotated +/- 90 degrees about the x axis.  Parameters: First four as
     for rampBar.  rotat: +/- 90 for amount of rotation about the x axis.   
     '''
+    from solid import rotate, translate
     # x-axis rotate below exchanges hi, wide - next two lines compensate.
     tcorr = [0,0,-wide] if rotat>0 else [0,-high,0]
     s = rotate([rotat,0,0])(rampBar(leng, high, wide, tcorr))
@@ -190,6 +236,8 @@ def cappedCube(leng, wide, hi, transl):
     high give x,y,z sizes.  transl = 3-vector with x,y,z distances to
     translate the origin-corner of the rectangular bar.
     '''
+    from solid import cube, cylinder, translate
+    from solid.utils import forward, right
     cu = cube([leng, wide, hi])
     ci = forward(wide/2)(cylinder(d=wide, h=hi))
     return translate(transl)(cu + ci + right(leng)(ci))
@@ -204,6 +252,8 @@ def makeLegs(rail, tapeA, tapeB, maxHi, oLegs, oRamps):
     to tapeA.high instead of maxHi.
 
     '''   
+    from solid import color
+    from solid.utils import Green, Red, Magenta
     eps     = rail.eps
     CapLen  = rail.CapLen
     EndLen  = rail.EndLen
@@ -233,9 +283,11 @@ def makeLegs(rail, tapeA, tapeB, maxHi, oLegs, oRamps):
     if lera: lera = color(Green)(lera)
     return lera, color(Red)(cutR)+color(Magenta)(cutL)
 #--------------------------------------------------
-def makeUnit(rail, tapeA, tapeB, maxHi):
+def makeUnit(rail, tapeA, tapeB, maxHi, holes=None):
     '''Make a unit based on rail length-and-width specs in rail, and tape
-    specs in tapeA, tapeB.'''
+    specs in tapeA, tapeB.  If list holes is given, post holes go into
+    it instead of into the unit.'''
+    from solid import cube
     oEnds, oLegs, oPosts, oRamps = (c in rail.Output for c in 'ELPR')
     eps     = rail.eps
     EndLen  = rail.EndLen
@@ -252,45 +304,225 @@ def makeUnit(rail, tapeA, tapeB, maxHi):
     px = rail.PostOffset
     if oPosts:
         for pn in range(rail.nPosts):          # Add set of posts
-            asm += makeTube(rail.PostID, rail.PostOD, CapThik+maxHi, [px, rail.CapWide/2, 0], 0, rail.eps)
+            asm += makeTube(rail.PostID, rail.PostOD, CapThik+maxHi, [px, rail.CapWide/2, 0], 0, rail.eps, holes)
             px  += PostStep
     return asm
 #--------------------------------------------------
-def produceOutput(mains):
-    eps = 0.02   # eps is mostly for clearing display sheen
-    rail = RailData(mains, eps)
-    tapes = getTapeDataList(mains)
-    # Find max leg height, and span across all units
+def unitKey(rail, tapeA, tapeB, maxHi):
+    '''Return a hashable key for the specs that makeUnit uses'''
+    def tapeKey(t): return (t.wide, t.high, t.oh1, t.oho, t.oh1a, t.ohoa)
+    return tuple(sorted(vars(rail).items())), tapeKey(tapeA), tapeKey(tapeB), maxHi
+#--------------------------------------------------
+def cachedUnit(rail, tapeA, tapeB, maxHi):
+    '''Return (key, unit, union of post holes or None) for the specs,
+    making the unit only if unitCache doesn't have it'''
+    from solid import union
+    key = unitKey(rail, tapeA, tapeB, maxHi)
+    if key not in unitCache:
+        if len(unitCache) > 255:    # Forget old specs, eg after many edits
+            unitCache.clear()
+        holes = []
+        unit = makeUnit(rail, tapeA, tapeB, maxHi, holes)
+        unitCache[key] = unit, union()(*holes) if holes else None
+    return (key,) + unitCache[key]
+#--------------------------------------------------
+def moduleDefs(protos):
+    '''Return SCAD text that defines a module for each unit prototype
+    in dict protos of name: (label, unit, holes), and for its holes'''
+    s = ''
+    for name, (label, unit, holes) in protos.items():
+        s += '\n\n' + scadModule(name, unit, label)
+        if holes:
+            s += '\n' + scadModule(name+'Holes', holes)
+    return s
+#--------------------------------------------------
+def unitSpan(rail, tapes):
+    '''Return max leg height, and span across all units'''
     maxHi = 0
     unwide = tapes[0].wide + tapes[-1].wide + 2*rail.Slack
     span = -rail.CapWide - unwide - tapes[0].oho - tapes[-1].oh1
     for tt in tapes:
         maxHi = max(maxHi, tt.high)
         span += rail.CapWide + tt.wide + rail.Slack - tt.oh1 - tt.oho
+    return maxHi, span
+#--------------------------------------------------
+def makeAssembly(rail, tapes, prof):
+    '''Make units and bridges per rail specs and list of tapes.  Return
+    the assembly; a list of (label, unit, width, holes) entries, one
+    per unit, holes being a call of its holes module or None; the
+    bridges; and a dict of name: (label, unit, holes) of unit
+    prototypes, for moduleDefs.  Units in the assembly are calls of
+    prototype modules.  Times go into StageProfile prof.'''
+    from solid import hole, union
+    from solid.solidpython import OpenSCADObject
+    from solid.utils import back
+    maxHi, span = unitSpan(rail, tapes)
     print ('Span across {} units is {:<0.2f}'.format(len(tapes)-1, span))
 
     # Make bridges
-    bridgeAsm = makeBridges(rail, span)
+    with prof.stage('bridges'):
+        bridgeAsm = makeBridges(rail, span)
     
-    asm = None
+    asm, units, protos, names = None, [], {}, {}
     sideA = tapes[0]
-    for sideB in tapes[1:]:
-        c = makeUnit(rail, sideA, sideB, maxHi)
-        openChan = sideA.wide + rail.Slack - sideA.oh1 - sideA.oho
-        asm = (c + back(rail.CapWide+openChan)(asm)) if asm else c
-        sideA = sideB
+    with prof.stage('units'):
+        for sideB in tapes[1:]:
+            pair = '{}/{}'.format(sideA.tab.getName(), sideB.tab.getName())
+            key, unit, holes = cachedUnit(rail, sideA, sideB, maxHi)
+            if key not in names:
+                names[key] = 'unit{}'.format(len(names)+1)
+                protos[names[key]] = (pair, unit, holes)
+            c = OpenSCADObject(names[key], {})
+            holeCall = OpenSCADObject(names[key]+'Holes', {}) if holes else None
+            if holes:
+                c += hole()(holeCall)
+            openChan = sideA.wide + rail.Slack - sideA.oh1 - sideA.oho
+            label = 'unit {} {}'.format(len(units)+1, pair)
+            units.append((label, c, rail.CapWide+openChan, holeCall))
+            sideA = sideB
+        shift = 0           # Move each unit back by widths of later units
+        for label, c, width, holeCall in reversed(units):
+            b = back(shift)(c) if shift else c
+            asm = asm.add(b) if asm else union()(b)
+            shift += width
     if bridgeAsm:
         asm += bridgeAsm
-    cylSegments = 44
-    cylSet_fn = '$fn = {};'.format(cylSegments)
+    return asm, units, bridgeAsm, protos
+#--------------------------------------------------
+def splitParts(units, bridgeAsm):
+    '''Return list of (label, part) for split output of units and
+    bridges from makeAssembly.  Each unit is moved back by the widths
+    of all later units.  The bridges part gets every unit's post holes
+    cut into it, as holes in the single-file assembly cut the bridges.'''
+    from solid import hole, union
+    from solid.utils import back
+    parts, shift, holes = [], 0, []
+    for label, c, width, holeCall in reversed(units):
+        parts.insert(0, (label, back(shift)(c) if shift else union()(c)))
+        if holeCall:
+            holes.insert(0, back(shift)(holeCall) if shift else holeCall)
+        shift += width
+    if bridgeAsm:
+        parts.append(('bridges', bridgeAsm + hole()(union()(holes)) if holes else bridgeAsm))
+    return parts
+#--------------------------------------------------
+def produceOutput(mains):
+    prof = StageProfile('smd-channelsProduce')
+    eps = 0.02   # eps is mostly for clearing display sheen
+    with prof.stage('tapes'):
+        rail = RailData(mains, eps)
+        tapes = getTapeDataList(mains)
     asmFile = 'channel-asm{}.scad'.format(version)
-    scad_render_to_file(asm, asmFile, file_header=cylSet_fn, include_orig_code=False)
-    print ('Wrote scad code to {}'.format(asmFile))
+    writeAssembly(rail, tapes, asmFile, CallData.splitOutput, prof, preview)
+    if startup:
+        startup.report()
+#--------------------------------------------------
+def writeAssembly(rail, tapes, asmFile, split, prof, preview=0):
+    '''Make assembly per rail and tapes and write it to asmFile, as
+    per-part files if split is true, and if preview is non-zero also
+    to a preview file with preview-sided cylinders.  Return total
+    volume, mm^3.'''
+    from solid import scad_render_to_file
+    asm, units, bridgeAsm, protos = makeAssembly(rail, tapes, prof)
+    with prof.stage('volumes'):
+        vols, bridgeVol = assemblyVolumes(rail, tapes, *unitSpan(rail, tapes))
+        total = sum(vols) + bridgeVol
+    print ('Volume {:0.2f} mL ({:0.2f} in bridges), about {:0.1f} g of PLA'.format(total/1000, bridgeVol/1000, massGrams(total)))
+    cylSegments = 44
+    cylSet_fn = '$fn = {};'.format(cylSegments) + moduleDefs(protos)
+    with prof.stage('render'):
+        if split:
+            parts = splitParts(units, bridgeAsm)
+            nNew, nOld, nGone = writeSplitScad(parts, asmFile, cylSet_fn)
+            print ('Wrote {} new parts ({} unchanged, {} removed) for {}'.format(nNew, nOld, nGone, asmFile))
+        else:
+            scad_render_to_file(asm, asmFile, file_header=cylSet_fn, include_orig_code=False)
+            print ('Wrote scad code to {}'.format(asmFile))
+        if preview:
+            previewFile = os.path.splitext(asmFile)[0] + '-preview.scad'
+            scad_render_to_file(asm, previewFile, file_header='$fn = {};'.format(preview) + moduleDefs(protos),
+                                include_orig_code=False)
+            print ('Wrote preview code to {}'.format(previewFile))
+    if profiling:
+        prof.count('units', len(units))
+        prof.count('unitTypes', len(protos))
+        prof.count('posts', len(units)*rail.nPosts if 'P' in rail.Output else 0)
+        prof.count('bridges', rail.Bridges)
+        prof.count('nodes', countNodes(asm))
+        prof.report(profileJSON)
+    return total
+#--------------------------------------------------
+def produceRail(snap, ro, asmFile, preview=0):
+    '''Worker for batchProduce: write asmFile for rail row ro of table
+    snapshot snap.  Return (printed text, units, volume, seconds).'''
+    t0, out = perf_counter(), StringIO()
+    mains = mainsFromSnapshot(snap)
+    mains.tab2.radioRo = ro
+    with redirect_stdout(out):
+        rail, tapes = RailData(mains, 0.02), getTapeDataList(mains)
+        total = writeAssembly(rail, tapes, asmFile, False,
+                              StageProfile('smd-channelsProduce rail {}'.format(ro)), preview)
+    return out.getvalue(), len(tapes)-1, total, perf_counter()-t0
+#--------------------------------------------------
+def batchProduce(mains, rows=None):
+    '''Write a .scad file for each rail row in list rows (or for all
+    rows of table 2 if rows is None), in parallel worker processes'''
+    from concurrent.futures import ProcessPoolExecutor
+    t0 = perf_counter()
+    snap = tablesSnapshot(mains)
+    labels = [r[Table2.colLabel()] for r in snap['2'][4]]
+    rows = range(len(labels)) if rows is None else rows
+    bad = [ro for ro in rows if ro not in range(len(labels))]
+    if bad:
+        sys.exit('No rail row {} in table 2; rows are 0 to {}'.format(
+            ', '.join(str(ro) for ro in bad), len(labels)-1))
+    files = []
+    for ro in rows:             # Name files by label, or row if no label
+        tag = re.sub(r'[^\w.-]', '_', labels[ro]) or 'row{}'.format(ro)
+        name = 'channel-asm{}-{}.scad'.format(version, tag)
+        files.append(name if name not in files else 'channel-asm{}-row{}.scad'.format(version, ro))
+    with ProcessPoolExecutor(min(len(files), os.cpu_count() or 1) or 1) as pool:
+        jobs = [pool.submit(produceRail, snap, ro, fi, preview) for ro, fi in zip(rows, files)]
+        for ro, fi, job in zip(rows, files, jobs):
+            text, nUnits, total, secs = job.result()
+            print (text, end='')
+            print ('Rail {} {}: {} units, {:0.2f} mL, {:0.2f} s -> {}'.format(ro, labels[ro], nUnits, total/1000, secs, fi))
+    print ('Batch of {} rails took {:0.2f} s'.format(len(files), perf_counter()-t0))
+#--------------------------------------------------
+def batchFlag(argv):
+    '''Find and remove --batch or --batch=r1,r2,... from argv.  Return
+    (True, list of rows or None) if found, else (False, None).'''
+    for k, arg in enumerate(argv):
+        if arg == '--batch' or arg.startswith('--batch='):
+            del argv[k]
+            rows = arg.partition('=')[2]
+            try:
+                return True, [int(r) for r in rows.split(',')] if rows else None
+            except ValueError:
+                sys.exit('Bad row number in {}; rows are integers, eg --batch=0,2'.format(arg))
+    return False, None
+#--------------------------------------------------
+def previewFlag(argv, default=8):
+    '''Find and remove --preview or --preview=k from argv.  Return k
+    (or default, for --preview) if found, else 0.'''
+    for k, arg in enumerate(argv):
+        if arg == '--preview' or arg.startswith('--preview='):
+            del argv[k]
+            return int(arg.partition('=')[2] or default)
+    return 0
 #--------------------------------------------------
 if __name__ == '__main__':
-    version = 4    
+    startup = startupFlag(sys.argv) # Remove --startup-profile arg
     print ('Program:  Make SMD Channels with Qt & SolidPython.  jiw - Feb 2019')
+    profiling, profileJSON = profileFlag(sys.argv) # Remove --profile arg
+    batch, batchRows = batchFlag(sys.argv)       # Remove --batch arg
+    preview = previewFlag(sys.argv)              # Remove --preview arg
+    if batch:                   # Batch-produce rails without Qt
+        from headlessTables import loadHeadless
+        batchProduce(loadHeadless(specsFileArg(sys.argv)), batchRows)
+        sys.exit(0)
+    from loadTablesForXML import loadAndShow
     # Link callbacks to volume-updater and scad-output routines
-    CallData.setProducers([calcVols, produceOutput])
+    CallData.setProducers([calcVols, produceOutput, batchProduce])
     # Load up .xml and run the app
     loadAndShow()
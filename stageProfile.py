@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+'''Module to record per-stage wall times, object counts, and peak
+memory of a generator run, and report them as a one-line summary and
+optionally as a JSON file.'''
+
+# Typical use:
+#     prof = StageProfile('pipeVue0')
+#     with prof.stage('layout'):
+#         ...
+#     prof.count('posts', len(posts))
+#     prof.lap('render')       # Time since previous lap, as a stage
+#     prof.report(jsonFile)    # jsonFile may be '' for no JSON
+#
+# Programs taking positional args can say `on, jsonFile =
+# profileFlag(argv)` to find and remove --profile or --profile=X.json
+# from argv before other arg processing.
+#
+# With --startup-profile among the program args, imports are timed
+# from when this module is imported: each outermost import of a
+# not-yet-loaded module (including ones done on first use, inside
+# functions) is recorded with its time and start offset.  Programs say
+# `startup = startupFlag(argv)` early in main, which removes the flag
+# and marks the start of main, and at the end `if startup:
+# startup.report()`.  (For finer detail, use python -X importtime.)
+
+import sys, json, builtins
+from time import perf_counter
+from contextlib import contextmanager
+
+def peakMemMB():
+    '''Return peak resident memory of this process in MB, or None if
+    not available on this platform'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        kb /= 1024              # macOS reports bytes, not KB
+    return kb/1024
+
+def countNodes(obj):
+    '''Return number of nodes in a SolidPython object tree'''
+    n, todo = 0, [obj] if obj else []
+    while todo:
+        o = todo.pop()
+        n += 1
+        todo.extend(o.children)
+    return n
+
+def profileFlag(argv):
+    '''Find and remove a --profile or --profile=fiName entry in list
+    argv.  Return (True, fiName) if found, with fiName = '' if not
+    given; else return (False, '').'''
+    for k, a in enumerate(argv):
+        if a == '--profile' or a.startswith('--profile='):
+            del argv[k]
+            return True, a[10:]
+    return False, ''
+
+class StageProfile:
+    '''Record wall time of named stages, plus named counts'''
+    def __init__(self, program):
+        self.program = program
+        self.stages, self.counts = {}, {}
+        self.t0 = self.tLap = perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        '''Time a block of code; times of same-named stages add up'''
+        t = perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + perf_counter() - t
+
+    def lap(self, name):
+        '''Record time since previous lap (or since start) as a stage'''
+        t = perf_counter()
+        self.stages[name] = self.stages.get(name, 0) + t - self.tLap
+        self.tLap = t
+
+    def count(self, name, n):
+        self.counts[name] = n
+
+    def asDict(self):
+        return {'program': self.program,
+                'stages':  {k: round(v, 6) for k, v in self.stages.items()},
+                'total':   round(perf_counter() - self.t0, 6),
+                'counts':  dict(self.counts),
+                'peakMemMB': peakMemMB()}
+
+    def summary(self):
+        '''Return a one-line summary of stage times and counts'''
+        d = self.asDict()
+        times = ', '.join(f'{k} {v:0.3f}' for k, v in d['stages'].items())
+        cnts  = ', '.join(f'{k} {v}' for k, v in d['counts'].items())
+        mem = d['peakMemMB']
+        mem = f'; peak {mem:0.1f} MB' if mem else ''
+        return f'Profile {self.program}: {times}; total {d["total"]:0.3f} s; {cnts}{mem}'
+
+    def report(self, jsonFile=''):
+        '''Print summary line, and if jsonFile is given write a JSON
+        report to it'''
+        print (self.summary())
+        if jsonFile:
+            with open(jsonFile, 'w') as fo:
+                json.dump(self.asDict(), fo, indent=2)
+            print (f'Wrote profile report to {jsonFile}')
+
+class ImportTimer:
+    '''Time outermost imports of modules not yet loaded, by wrapping
+    builtins.__import__'''
+    def __init__(self):
+        self.times, self.inImport = [], False # (name, seconds, start)
+        self.t0 = perf_counter()
+        self.tMain = None
+        self.realImport = builtins.__import__
+        builtins.__import__ = self.timedImport
+
+    def timedImport(self, name, *args, **kw):
+        if self.inImport or name in sys.modules:
+            return self.realImport(name, *args, **kw)
+        self.inImport, t = True, perf_counter()
+        try:
+            return self.realImport(name, *args, **kw)
+        finally:
+            self.inImport = False
+            self.times.append((name, perf_counter()-t, t-self.t0))
+
+    def report(self, minMs=1):
+        '''Print time to start of main, and imports taking at least
+        minMs milliseconds, slowest first'''
+        ms = lambda t: f'{1000*t:0.1f} ms'
+        tMain = self.tMain if self.tMain is not None else perf_counter() - self.t0
+        before = sum(dt for name, dt, t in self.times if t < tMain)
+        print (f'Startup profile: main began at {ms(tMain)}, after {ms(before)} of imports; '
+               f'{ms(sum(dt for name, dt, t in self.times))} of imports in all')
+        for name, dt, t in sorted(self.times, key=lambda e: -e[1]):
+            if 1000*dt >= minMs:
+                print (f'  {ms(dt):>10} {name:24} at {ms(t)}{"" if t < tMain else ", on first use"}')
+
+importTimer = ImportTimer() if '--startup-profile' in sys.argv else None
+
+def startupFlag(argv):
+    '''Remove --startup-profile from list argv, and mark start of main.
+    Return the ImportTimer if the flag was given, else None.'''
+    if '--startup-profile' in argv:
+        argv.remove('--startup-profile')
+    if importTimer:
+        importTimer.tMain = perf_counter() - importTimer.t0
+    return importTimer